@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import LazyObject
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+
+def token_user_id(request):
+    """
+    id пользователя из JWT в заголовке без запроса в БД или None,
+    если токена нет или он недействителен.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    try:
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        token = authentication.get_validated_token(raw_token)
+    except AuthenticationFailed:
+        return None
+    return token.get(api_settings.USER_ID_CLAIM)
+
+
+def check_active(user):
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed(
+            "Пользователь отключён.", code="user_inactive"
+        )
+
+
+class LazyTokenUser(LazyObject):
+    """
+    Пользователь из токена: id берётся из claims,
+    строка из БД загружается только при обращении к другим атрибутам
+    и тогда же проверяется is_active. Запрос, которому хватает id,
+    пройдёт и у отключённого пользователя, пока не истечёт токен
+    (ACCESS_TOKEN_LIFETIME).
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        self.__dict__["_user_id"] = User._meta.pk.to_python(
+            token[api_settings.USER_ID_CLAIM]
+        )
+        super().__init__()
+
+    @property
+    def pk(self):
+        return self._user_id
+
+    id = pk
+
+    def __bool__(self):
+        return True
+
+    def _setup(self):
+        try:
+            user = User.objects.get(
+                **{api_settings.USER_ID_FIELD: self._user_id}
+            )
+        except User.DoesNotExist as e:
+            raise AuthenticationFailed(
+                "Пользователь не найден.", code="user_not_found"
+            ) from e
+        check_active(user)
+        self._wrapped = user
+
+
+class SafeMethodLazyJWTAuthentication(JWTAuthentication):
+    """
+    Для безопасных методов не делает запрос пользователя в БД,
+    для изменяющих запросов работает как JWTAuthentication.
+    """
+
+    def authenticate(self, request):
+        self.stateless = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if (
+            not self.stateless
+            or api_settings.USER_ID_CLAIM not in validated_token
+        ):
+            return super().get_user(validated_token)
+        return api_settings.TOKEN_USER_CLASS(validated_token)
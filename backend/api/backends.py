@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Lower
 
 
 class EmailBackend(ModelBackend):
@@ -11,7 +12,9 @@ class EmailBackend(ModelBackend):
         if not login_email:
             return None
         try:
-            user = UserModel.objects.get(email__iexact=login_email)
+            user = UserModel.objects.alias(email_lower=Lower("email")).get(
+                email_lower=login_email.strip().lower()
+            )
         except UserModel.DoesNotExist:
             return None
         if user.check_password(password) and self.user_can_authenticate(user):
@@ -1,13 +1,126 @@
-import base64
+import binascii
+from base64 import b64decode
+from tempfile import SpooledTemporaryFile
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 from rest_framework import serializers
 
+from foodgram import metrics
+from .thumbnails import thumbnail_url
+
+BASE64_MARKER = ";base64,"
+BASE64_HEADER_MAX_LENGTH = 64
+BASE64_CHUNK_SIZE = 64 * 1024
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"GIF87a", "gif", "image/gif"),
+    (b"GIF89a", "gif", "image/gif"),
+)
+
+
+def sniff_image(head):
+    """Расширение и MIME-тип по сигнатуре файла, а не по data URI."""
+    for signature, ext, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext, content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    return None
+
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        "invalid_base64": "Некорректная строка base64.",
+        "too_large": "Размер изображения больше {max_size} байт.",
+        "unsupported_format": (
+            "Поддерживаются только изображения PNG, JPEG, GIF и WebP."
+        ),
+        "too_many_pixels": (
+            "Изображение {width}x{height} больше {max_pixels} пикселей."
+        ),
+    }
+
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith("data:image"):
-            format, imgstr = data.split(";base64,")
-            ext = format.split("/")[-1]
-            data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
-        return super().to_internal_value(data)
+        with metrics.timer(metrics.IMAGE_DECODE_DURATION):
+            if isinstance(data, str) and data.startswith("data:image"):
+                return self.decode_data_uri(data)
+            return super().to_internal_value(data)
+
+    def decode_data_uri(self, data):
+        """
+        Декодирует base64 пачками во временный файл, который остаётся в
+        памяти до FILE_UPLOAD_MAX_MEMORY_SIZE. Размер проверяется по
+        длине строки до декодирования, формат — по сигнатуре первой
+        пачки, размеры в пикселях — по заголовку до разбора пикселей.
+        """
+        marker = data.find(BASE64_MARKER, 0, BASE64_HEADER_MAX_LENGTH)
+        if marker == -1:
+            self.fail("invalid_base64")
+        start = marker + len(BASE64_MARKER)
+        length = len(data) - start
+        if not length or length % 4:
+            self.fail("invalid_base64")
+        size = length // 4 * 3 - data.count("=", len(data) - 2)
+        if size > settings.IMAGE_MAX_SIZE:
+            self.fail("too_large", max_size=settings.IMAGE_MAX_SIZE)
+        chunks = (
+            data[offset:offset + BASE64_CHUNK_SIZE]
+            for offset in range(start, len(data), BASE64_CHUNK_SIZE)
+        )
+        try:
+            head = b64decode(next(chunks), validate=True)
+        except binascii.Error:
+            self.fail("invalid_base64")
+        image_type = sniff_image(head)
+        if image_type is None:
+            self.fail("unsupported_format")
+        ext, content_type = image_type
+        file = SpooledTemporaryFile(settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        try:
+            file.write(head)
+            for chunk in chunks:
+                file.write(b64decode(chunk, validate=True))
+            upload = UploadedFile(file, "temp." + ext, content_type, size)
+            self.verify_image(upload)
+        except binascii.Error:
+            file.close()
+            self.fail("invalid_base64")
+        except serializers.ValidationError:
+            file.close()
+            raise
+        return serializers.FileField.to_internal_value(self, upload)
+
+    def verify_image(self, upload):
+        """
+        Проверка из ImageField без копирования файла в BytesIO: сначала
+        размеры из заголовка, затем verify() без разбора пикселей.
+        """
+        upload.seek(0)
+        try:
+            with Image.open(upload) as image:
+                width, height = image.size
+                if width * height <= settings.IMAGE_MAX_PIXELS:
+                    image.verify()
+        except Exception:
+            self.fail("invalid_image")
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            self.fail(
+                "too_many_pixels",
+                width=width,
+                height=height,
+                max_pixels=settings.IMAGE_MAX_PIXELS,
+            )
+        upload.seek(0)
+
+    def to_representation(self, value):
+        size = self.context.get("image_size")
+        if not value or size is None:
+            return super().to_representation(value)
+        url = thumbnail_url(value, size)
+        request = self.context.get("request")
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
@@ -1,7 +1,8 @@
 from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet,
+                                           ChoiceFilter, FilterSet,
                                            ModelMultipleChoiceFilter,
                                            NumberFilter)
+from food.constants import RANKING_FIELDS
 from food.models import Ingredients, Recipe, Tags
 
 
@@ -14,20 +15,41 @@ class RecipeFilter(FilterSet):
     )
     is_favorited = BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = BooleanFilter(method="filter_is_in_shopping_cart")
+    q = CharFilter(method="filter_q")
+    ordering = ChoiceFilter(
+        choices=[(name, name) for name in RANKING_FIELDS],
+        method="filter_ordering",
+    )
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favorited_by__user=self.request.user)
+            return queryset.filter(
+                favorited_by__user_id=self.request.user.pk
+            )
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shopping_cart_by__user=self.request.user)
+            return queryset.filter(
+                shopping_cart_by__user_id=self.request.user.pk
+            )
+        return queryset
+
+    def filter_q(self, queryset, name, value):
+        value = value.strip()
+        if value:
+            return queryset.search(value)
         return queryset
 
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(f"-{RANKING_FIELDS[value]}", "-id")
+
     class Meta:
         model = Recipe
-        fields = ["author", "tags", "is_favorited", "is_in_shopping_cart"]
+        fields = [
+            "author", "tags", "is_favorited", "is_in_shopping_cart", "q",
+            "ordering",
+        ]
 
 
 class IngredientFilter(FilterSet):
@@ -0,0 +1,208 @@
+import json
+import re
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.middleware import PERCENTILES, percentile
+from food.models import Ingredients, Recipe
+
+User = get_user_model()
+
+SERVER_TIMING_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def endpoints(recipe, author, ingredient_prefix):
+    return {
+        "recipes_list": "/api/recipes/",
+        "recipes_list_limit_50": "/api/recipes/?limit=50",
+        "recipes_list_fields": (
+            "/api/recipes/?limit=50&fields=id,name,image,cooking_time"
+        ),
+        "recipes_by_tag": "/api/recipes/?tags=breakfast&tags=lunch",
+        "recipes_by_author": f"/api/recipes/?author={author.pk}",
+        "recipes_favorited": "/api/recipes/?is_favorited=1",
+        "recipes_in_cart": "/api/recipes/?is_in_shopping_cart=1",
+        "recipe_detail": f"/api/recipes/{recipe.pk}/",
+        "recipe_get_link": f"/api/recipes/{recipe.pk}/get-link/",
+        "short_link": f"/s/{recipe.short_code}/",
+        "download_shopping_cart": "/api/recipes/download_shopping_cart/",
+        "users_list": "/api/users/",
+        "user_detail": f"/api/users/{author.pk}/",
+        "users_me": "/api/users/me/",
+        "subscriptions": "/api/users/subscriptions/?recipes_limit=3",
+        "tags": "/api/tags/",
+        "ingredients": "/api/ingredients/",
+        "ingredients_search": f"/api/ingredients/?name={ingredient_prefix}",
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный прогон GET-эндпоинтов API. Печатает JSON с "
+        "пропускной способностью, перцентилями задержки и числом запросов "
+        "к БД, который можно сравнивать между коммитами"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100,
+                            help="Запросов на каждый эндпоинт")
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--concurrency", type=int, default=1,
+                            help="Параллельных клиентов (только с --url)")
+        parser.add_argument(
+            "--url",
+            help="Адрес запущенного сервера. Без него запросы выполняются "
+                 "в процессе через django.test.Client",
+        )
+        parser.add_argument("--email", help="Пользователь для запросов")
+        parser.add_argument("--only", nargs="*", help="Имена эндпоинтов")
+        parser.add_argument("--output", help="Файл для JSON-результата")
+        parser.add_argument("--compare", help="JSON предыдущего прогона")
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["email"])
+        recipe = Recipe.objects.exclude(short_code=None).first()
+        ingredient = Ingredients.objects.first()
+        if recipe is None or ingredient is None:
+            raise CommandError(
+                "База пуста, сначала выполните manage.py seed_data"
+            )
+        token = str(AccessToken.for_user(user))
+        targets = endpoints(recipe, recipe.author, ingredient.name[:3])
+        if options["only"]:
+            targets = {
+                name: url for name, url in targets.items()
+                if name in options["only"]
+            }
+        concurrency = options["concurrency"] if options["url"] else 1
+        if options["url"]:
+            run = self.http_runner(options["url"], token)
+        else:
+            setup_test_environment()
+            run = self.local_runner(token)
+        results = {}
+        for name, url in targets.items():
+            for _ in range(options["warmup"]):
+                run(url)
+            results[name] = self.measure(
+                run, url, options["requests"], concurrency
+            )
+            self.stderr.write(f"{name}: {results[name]}")
+        report = {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "mode": "http" if options["url"] else "local",
+            "requests": options["requests"],
+            "concurrency": concurrency,
+            "dataset": {
+                "users": User.objects.count(),
+                "recipes": Recipe.objects.count(),
+            },
+            "results": results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output)
+        self.stdout.write(output)
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def get_user(self, email):
+        users = User.objects.annotate(
+            purchases_count=Count("purchases")
+        ).order_by("-purchases_count", "id")
+        if email:
+            users = User.objects.filter(email=email)
+        user = users.first()
+        if user is None:
+            raise CommandError("Пользователь не найден")
+        return user
+
+    def local_runner(self, token):
+        client = Client(HTTP_AUTHORIZATION=f"Token {token}")
+
+        def run(url):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(url)
+                elapsed = time.perf_counter() - start
+            return response.status_code, elapsed, len(queries)
+
+        return run
+
+    def http_runner(self, base_url, token):
+        session = requests.Session()
+        session.headers["Authorization"] = f"Token {token}"
+        base_url = base_url.rstrip("/")
+
+        def run(url):
+            start = time.perf_counter()
+            response = session.get(base_url + url, allow_redirects=False)
+            elapsed = time.perf_counter() - start
+            match = SERVER_TIMING_QUERIES_RE.search(
+                response.headers.get("Server-Timing", "")
+            )
+            queries = int(match.group(1)) if match else None
+            return response.status_code, elapsed, queries
+
+        return run
+
+    def measure(self, run, url, requests_count, concurrency):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(
+                lambda _: run(url), range(requests_count)
+            ))
+        wall = time.perf_counter() - start
+        statuses = sorted({status for status, _, _ in samples})
+        latencies = [elapsed * 1000 for _, elapsed, _ in samples]
+        queries = [count for _, _, count in samples if count is not None]
+        result = {
+            "status": statuses,
+            "throughput_rps": round(len(samples) / wall, 1),
+            "mean_ms": round(statistics.fmean(latencies), 2),
+        }
+        for percent in PERCENTILES:
+            result[f"p{percent}_ms"] = round(
+                percentile(latencies, percent), 2
+            )
+        result["queries"] = max(queries) if queries else None
+        return result
+
+    def compare(self, path, results):
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f)["results"]
+        self.stdout.write("")
+        for name, current in results.items():
+            before = previous.get(name)
+            if before is None:
+                continue
+            change = (current["p50_ms"] / before["p50_ms"] - 1) * 100
+            self.stdout.write(
+                f"{name:24} p50 {before['p50_ms']:>8} -> "
+                f"{current['p50_ms']:>8} мс ({change:+.1f}%), "
+                f"запросов {before['queries']} -> {current['queries']}"
+            )
@@ -0,0 +1,95 @@
+import base64
+import json
+import random
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+from rest_framework import serializers
+
+from api.fields import Base64ImageField
+
+
+class LegacyBase64ImageField(serializers.ImageField):
+    """Прежняя реализация: весь base64 декодируется в память."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith("data:image"):
+            format, imgstr = data.split(";base64,")
+            ext = format.split("/")[-1]
+            data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
+        return super().to_internal_value(data)
+
+
+class Command(BaseCommand):
+    help = (
+        "Время и пик памяти Python при разборе картинок в base64 "
+        "прежним и текущим Base64ImageField"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--width", type=int, default=2400)
+        parser.add_argument("--height", type=int, default=1800)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        size = (options["width"], options["height"])
+        payloads = {
+            "small_jpeg": self.data_uri(
+                self.noise((640, 480)), "JPEG", quality=90
+            ),
+            "jpeg": self.data_uri(self.noise(size), "JPEG", quality=90),
+            "png": self.data_uri(self.noise(size), "PNG"),
+            "pixel_bomb_png": self.data_uri(
+                Image.new("L", (8000, 8000)), "PNG"
+            ),
+        }
+        fields = {
+            "legacy": LegacyBase64ImageField(),
+            "current": Base64ImageField(),
+        }
+        results = {}
+        for name, payload in payloads.items():
+            results[name] = {"base64_bytes": len(payload)}
+            for label, field in fields.items():
+                elapsed, peak, outcome = self.measure(field, payload, options)
+                results[name][label] = {
+                    "ms": elapsed,
+                    "peak_kb": peak,
+                    "result": outcome,
+                }
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+
+    def noise(self, size):
+        rng = random.Random(42)
+        return Image.frombytes(
+            "RGB", size, rng.randbytes(size[0] * size[1] * 3)
+        )
+
+    def data_uri(self, image, image_format, **params):
+        buffer = BytesIO()
+        image.save(buffer, format=image_format, **params)
+        encoded = base64.b64encode(buffer.getvalue()).decode()
+        return f"data:image/{image_format.lower()};base64,{encoded}"
+
+    def measure(self, field, payload, options):
+        best = None
+        for _ in range(options["repeat"]):
+            tracemalloc.start()
+            start = time.perf_counter()
+            try:
+                file = field.to_internal_value(payload)
+            except serializers.ValidationError as error:
+                outcome = str(error.detail[0])
+            else:
+                outcome = f"{file.size} байт"
+                file.close()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            if best is None or elapsed < best[0]:
+                best = (elapsed, peak)
+        return round(best[0] * 1000, 2), best[1] // 1024, outcome
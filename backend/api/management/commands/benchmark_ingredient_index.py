@@ -0,0 +1,74 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.middleware import PERCENTILES, percentile
+from food.ingredient_index import IngredientIndex
+from food.models import Ingredients
+
+
+class Command(BaseCommand):
+    help = (
+        "Задержка подбора рецептов по ингредиентам (what_can_i_cook) "
+        "на индексе из базы или на синтетическом наборе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--synthetic", type=int, metavar="RECIPES",
+            help="Построить индекс из случайных данных вместо базы",
+        )
+        parser.add_argument("--ingredients", type=int, default=2000,
+                            help="Размер справочника для --synthetic")
+        parser.add_argument("--per-recipe", type=int, default=8)
+        parser.add_argument("--at-home", type=int, default=15,
+                            help="Ингредиентов в запросе")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        index = IngredientIndex()
+        start = time.perf_counter()
+        if options["synthetic"]:
+            catalog = np.arange(1, options["ingredients"] + 1)
+            weights = 1 / catalog
+            weights /= weights.sum()
+            recipes = options["synthetic"]
+            per_recipe = options["per_recipe"]
+            index.set_pairs(
+                rng.choice(catalog, size=recipes * per_recipe, p=weights),
+                np.repeat(np.arange(1, recipes + 1), per_recipe),
+            )
+        else:
+            index.build()
+            catalog = np.fromiter(
+                Ingredients.objects.values_list("id", flat=True),
+                dtype=np.int64,
+            )
+        build_ms = (time.perf_counter() - start) * 1000
+        latencies = []
+        for _ in range(options["queries"]):
+            at_home = rng.choice(
+                catalog, size=options["at_home"], replace=False
+            ).tolist()
+            start = time.perf_counter()
+            index.match(at_home, options["limit"])
+            latencies.append((time.perf_counter() - start) * 1000)
+        postings, _, sizes = index.base
+        result = {
+            "recipes": int(np.count_nonzero(sizes)),
+            "postings": len(postings),
+            "index_mb": round(
+                sum(array.nbytes for array in index.base) / 1024 ** 2, 1
+            ),
+            "build_ms": round(build_ms, 1),
+        }
+        for percent in PERCENTILES:
+            result[f"p{percent}_ms"] = round(
+                percentile(latencies, percent), 2
+            )
+        self.stdout.write(json.dumps(result, indent=2))
@@ -0,0 +1,99 @@
+import json
+import random
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.filters import RecipeFilter
+from api.middleware import PERCENTILES, percentile
+from food.models import FavoriteRecipe, Recipe
+from food.partitioning import is_partitioned
+
+User = get_user_model()
+
+FILL_FAVORITES_SQL = """
+INSERT INTO food_favoriterecipe (user_id, recipe_id, created_at)
+SELECT
+    users.ids[1 + floor(random() * array_length(users.ids, 1))::int],
+    recipes.ids[1 + floor(random() * array_length(recipes.ids, 1))::int],
+    now()
+FROM generate_series(1, %s),
+    (SELECT array_agg(id) AS ids FROM users_user) AS users,
+    (SELECT array_agg(id) AS ids FROM food_recipe) AS recipes
+ON CONFLICT DO NOTHING
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Задержка фильтра is_favorited (join с избранным) на текущей "
+        "схеме. Запустить до и после partition_relations, при "
+        "необходимости дозаполнив избранное через --fill"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fill", type=int, metavar="ROWS",
+            help="Дозаполнить избранное до ROWS строк (PostgreSQL)",
+        )
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--limit", type=int, default=6)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        postgres = connection.vendor == "postgresql"
+        if options["fill"]:
+            if not postgres:
+                raise CommandError("--fill доступен только в PostgreSQL")
+            missing = options["fill"] - FavoriteRecipe.objects.count()
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute(FILL_FAVORITES_SQL, [max(missing, 0)])
+                cursor.execute("ANALYZE food_favoriterecipe")
+            self.stdout.write(
+                f"Добавлено строк: {max(missing, 0)} за "
+                f"{time.perf_counter() - start:.1f} с"
+            )
+        user_ids = list(User.objects.values_list("id", flat=True))
+        if not user_ids:
+            raise CommandError("Нет пользователей, запустите seed_data")
+        rng = random.Random(options["seed"])
+        page_latencies, count_latencies = [], []
+        for _ in range(options["queries"]):
+            user = SimpleNamespace(pk=rng.choice(user_ids),
+                                   is_authenticated=True)
+            queryset = RecipeFilter(
+                {"is_favorited": "true"},
+                queryset=Recipe.objects.all(),
+                request=SimpleNamespace(user=user),
+            ).qs
+            start = time.perf_counter()
+            queryset.count()
+            count_latencies.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            list(queryset.values_list("id", flat=True)[:options["limit"]])
+            page_latencies.append((time.perf_counter() - start) * 1000)
+        result = {
+            "favorites": FavoriteRecipe.objects.count(),
+            "users": len(user_ids),
+        }
+        if postgres:
+            with connection.cursor() as cursor:
+                result["partitioned"] = is_partitioned(
+                    cursor, FavoriteRecipe._meta.db_table
+                )
+        for name, latencies in (
+            ("count", count_latencies), ("page", page_latencies)
+        ):
+            for percent in PERCENTILES:
+                result[f"{name}_p{percent}_ms"] = round(
+                    percentile(latencies, percent), 2
+                )
+        self.stdout.write(json.dumps(result, indent=2))
+        if postgres:
+            self.stdout.write(queryset[:options["limit"]].explain(
+                analyze=True, buffers=True
+            ))
@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import IngredientSerializer, RecipeReadSerializer
+from food.models import Ingredients, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение времени рендеринга JSON стандартным JSONRenderer "
+        "и FastJSONRenderer на больших списках"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError("orjson не установлен")
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        context = {"request": request}
+        payloads = {
+            "ingredients": IngredientSerializer(
+                Ingredients.objects.all(), many=True
+            ).data,
+            "recipes": RecipeReadSerializer(
+                Recipe.objects.for_read(request.user)[:options["recipes"]],
+                many=True,
+                context=context,
+            ).data,
+        }
+        results = {}
+        for name, data in payloads.items():
+            expected = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != expected:
+                raise CommandError(f"{name}: вывод рендереров отличается")
+            stdlib_ms = self.best_time(JSONRenderer(), data, options)
+            fast_ms = self.best_time(FastJSONRenderer(), data, options)
+            results[name] = {
+                "items": len(data),
+                "bytes": len(expected),
+                "JSONRenderer_ms": stdlib_ms,
+                "FastJSONRenderer_ms": fast_ms,
+                "speedup": round(stdlib_ms / fast_ms, 1),
+            }
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+
+    def best_time(self, renderer, data, options):
+        best = None
+        for _ in range(options["repeat"]):
+            start = time.perf_counter()
+            renderer.render(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return round(best * 1000, 3)
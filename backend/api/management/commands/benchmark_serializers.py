@@ -0,0 +1,96 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import (DetailUserSerializer, RecipeReadSerializer,
+                             RecipeSerializer, UserReadSerializer)
+from food.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение быстрых сериализаторов чтения с ModelSerializer: "
+        "проверка побайтового совпадения JSON и объектов в секунду"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--objects", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--anonymous", action="store_true")
+        parser.add_argument("--output", help="Файл для JSON-результата")
+
+    def handle(self, *args, **options):
+        request = self.make_request(options["anonymous"])
+        limit = options["objects"]
+        recipes = list(Recipe.objects.for_read(request.user)[:limit])
+        users = list(User.objects.with_is_subscribed(request.user)[:limit])
+        if not recipes:
+            raise CommandError(
+                "Нет рецептов, сначала выполните manage.py seed_data"
+            )
+        context = {"request": request}
+        results = {
+            "recipes": self.compare(
+                RecipeSerializer, RecipeReadSerializer, recipes, context,
+                options["repeat"],
+            ),
+            "users": self.compare(
+                DetailUserSerializer, UserReadSerializer, users, context,
+                options["repeat"],
+            ),
+        }
+        output = json.dumps(results, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def make_request(self, anonymous):
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        if not anonymous:
+            request.user = User.objects.annotate(
+                favorites_count=Count("favorites")
+            ).order_by("-favorites_count", "id").first()
+        return request
+
+    def render(self, serializer_class, objects, context):
+        return JSONRenderer().render(
+            serializer_class(objects, many=True, context=context).data
+        )
+
+    def objects_per_second(self, serializer_class, objects, context, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self.render(serializer_class, objects, context)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return round(len(objects) / best, 1)
+
+    def compare(self, reference, fast, objects, context, repeat):
+        expected = self.render(reference, objects, context)
+        actual = self.render(fast, objects, context)
+        if expected != actual:
+            raise CommandError(
+                f"{fast.__name__} отличается от {reference.__name__}:\n"
+                f"{expected[:500]!r}\n{actual[:500]!r}"
+            )
+        reference_rate = self.objects_per_second(
+            reference, objects, context, repeat
+        )
+        fast_rate = self.objects_per_second(fast, objects, context, repeat)
+        return {
+            "objects": len(objects),
+            "identical_json": True,
+            reference.__name__: reference_rate,
+            fast.__name__: fast_rate,
+            "speedup": round(fast_rate / reference_rate, 1),
+        }
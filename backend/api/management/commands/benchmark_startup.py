@@ -0,0 +1,158 @@
+import json
+import os
+import queue
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+STARTUP_CODE = """
+import time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+from foodgram.wsgi import application
+get_resolver().url_patterns
+print((time.perf_counter() - start) * 1000)
+"""
+READY_PATTERN = re.compile(r"Обработчик (\d+) готов за ([\d.]+) с")
+
+
+def parse_importtime(output):
+    """Строки -X importtime: (своё время, суммарное, глубина, модуль)."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(own), int(cumulative), depth, name.strip()))
+    return rows
+
+
+def pipe_lines(stream, lines):
+    for line in stream:
+        lines.put(line)
+
+
+class Command(BaseCommand):
+    help = (
+        "Время импорта приложения в новом процессе (python -X importtime) "
+        "по пакетам и время готовности процессов gunicorn с preload_app "
+        "и без него"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--skip-gunicorn", action="store_true")
+        parser.add_argument("--timeout", type=float, default=60)
+
+    def handle(self, *args, **options):
+        result = self.profile_imports(options)
+        if not options["skip_gunicorn"]:
+            result["gunicorn"] = {
+                f"preload_{preload}": self.gunicorn_readiness(
+                    preload, options
+                )
+                for preload in (True, False)
+            }
+        self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+
+    def profile_imports(self, options):
+        best = None
+        for _ in range(options["repeat"]):
+            process = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+            )
+            if process.returncode:
+                raise CommandError(process.stderr[-2000:])
+            elapsed = float(process.stdout.strip().splitlines()[-1])
+            if best is None or elapsed < best[0]:
+                best = (elapsed, process.stderr)
+        rows = parse_importtime(best[1])
+        packages = Counter()
+        for own, _, _, name in rows:
+            packages[name.split(".")[0]] += own
+        return {
+            "startup_ms": round(best[0], 1),
+            "modules": len(rows),
+            "packages_ms": {
+                name: round(own / 1000, 1)
+                for name, own in packages.most_common(options["top"])
+            },
+            "top_level_imports_ms": {
+                name: round(cumulative / 1000, 1)
+                for _, cumulative, _, name in sorted(
+                    (row for row in rows if row[2] == 0),
+                    key=lambda row: row[1],
+                    reverse=True,
+                )[:options["top"]]
+            },
+        }
+
+    def gunicorn_readiness(self, preload, options):
+        """
+        Запускает gunicorn с gunicorn.conf.py и ждёт, пока все процессы
+        сообщат о готовности (хук post_worker_init).
+        """
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        env = {
+            **os.environ,
+            "GUNICORN_PRELOAD": str(preload),
+            "PROMETHEUS_MULTIPROC_DIR": tempfile.mkdtemp(),
+        }
+        start = time.monotonic()
+        process = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn", "foodgram.wsgi",
+                "--config", "gunicorn.conf.py",
+                "--bind", f"127.0.0.1:{port}",
+                "--workers", str(options["workers"]),
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        lines = queue.Queue()
+        threading.Thread(
+            target=pipe_lines, args=(process.stderr, lines), daemon=True
+        ).start()
+        ready = []
+        deadline = start + options["timeout"]
+        try:
+            while len(ready) < options["workers"]:
+                try:
+                    line = lines.get(
+                        timeout=max(deadline - time.monotonic(), 0)
+                    )
+                except queue.Empty:
+                    raise CommandError(
+                        "gunicorn не запустился за отведённое время"
+                    )
+                match = READY_PATTERN.search(line)
+                if match:
+                    ready.append(float(match.group(2)) * 1000)
+            elapsed = time.monotonic() - start
+        finally:
+            process.terminate()
+            process.wait()
+        return {
+            "all_workers_ready_ms": round(elapsed * 1000, 1),
+            "worker_ready_ms": sorted(round(value, 1) for value in ready),
+        }
@@ -0,0 +1,363 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram import metrics
+from .authentication import token_user_id
+from .replicas import RoutingState, routing_state
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+_current_record = ContextVar("instrumentation_record", default=None)
+
+SQL_NUMBER_RE = re.compile(r"\b\d+\b")
+SQL_PARAMS_RE = re.compile(r"%s(?:, %s)+")
+PERCENTILES = (50, 95, 99)
+COMPRESSIBLE_PATH = "/api/"
+COMPRESSIBLE_TYPES = ("application/json",)
+GZIP_MAX_RANDOM_BYTES = 100
+
+
+def accepted_encodings(header):
+    """
+    Кодировки из Accept-Encoding с q больше нуля. Звёздочка разрешает
+    кодировки, не названные в заголовке явно.
+    """
+    weights = {}
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+    wildcard = weights.pop("*", 0.0)
+    return {
+        coding
+        for coding in ("br", "gzip")
+        if weights.get(coding, wildcard) > 0
+    }
+
+
+def sql_shape(sql):
+    return SQL_PARAMS_RE.sub("%s...", SQL_NUMBER_RE.sub("N", sql))
+
+
+def view_name(view_func, method):
+    view_class = getattr(view_func, "cls", None)
+    if view_class is None:
+        return view_func.__name__
+    action = (getattr(view_func, "actions", None) or {}).get(method.lower())
+    return f"{view_class.__name__}.{action}" if action else view_class.__name__
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * percent // 100) - 1)
+    return ordered[index]
+
+
+class RequestRecord:
+    __slots__ = (
+        "view", "queries", "db_time", "serializer_time",
+        "serializer_depth", "shapes",
+    )
+
+    def __init__(self, track_shapes=True):
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.shapes = Counter() if track_shapes else None
+
+
+class MetricsStore:
+    """Последние замеры по каждому view в памяти процесса."""
+
+    fields = ("total_ms", "db_ms", "serializer_ms", "queries")
+
+    def __init__(self, sample_size):
+        self._samples = defaultdict(lambda: deque(maxlen=sample_size))
+        self._counts = Counter()
+        self._lock = Lock()
+
+    def add(self, view, sample):
+        with self._lock:
+            self._samples[view].append(sample)
+            self._counts[view] += 1
+
+    def summary(self):
+        with self._lock:
+            samples = {
+                view: list(rows) for view, rows in self._samples.items()
+            }
+            counts = dict(self._counts)
+        result = {}
+        for view, rows in samples.items():
+            result[view] = {"count": counts[view]}
+            for position, field in enumerate(self.fields):
+                values = [row[position] for row in rows]
+                result[view][field] = {
+                    f"p{percent}": round(percentile(values, percent), 2)
+                    for percent in PERCENTILES
+                }
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+metrics_store = MetricsStore(settings.INSTRUMENTATION_SAMPLE_SIZE)
+
+
+def record_query(execute, sql, params, many, context):
+    record = _current_record.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.db_time += time.perf_counter() - start
+        record.queries += 1
+        if record.shapes is not None:
+            record.shapes[sql_shape(sql)] += 1
+
+
+def timed_representation(to_representation):
+    @wraps(to_representation)
+    def wrapper(self, *args, **kwargs):
+        record = _current_record.get()
+        if record is None or record.serializer_depth:
+            return to_representation(self, *args, **kwargs)
+        record.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return to_representation(self, *args, **kwargs)
+        finally:
+            record.serializer_depth -= 1
+            record.serializer_time += time.perf_counter() - start
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def instrument_serializers():
+    for serializer_class in (serializers.Serializer,
+                             serializers.ListSerializer):
+        method = serializer_class.to_representation
+        if not getattr(method, "instrumented", False):
+            serializer_class.to_representation = timed_representation(method)
+
+
+class InstrumentationMiddleware:
+    """
+    Считает запросы к БД, время БД, сериализации и ответа по каждому view.
+    Включается настройками INSTRUMENTATION_ENABLED (заголовки, лог,
+    /api/_metrics/) и PROMETHEUS_ENABLED (метрики Prometheus).
+    """
+
+    def __init__(self, get_response):
+        self.instrumentation = settings.INSTRUMENTATION_ENABLED
+        self.prometheus = settings.PROMETHEUS_ENABLED
+        if not self.instrumentation and not self.prometheus:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.duplicate_threshold = settings.INSTRUMENTATION_DUPLICATE_QUERIES
+        if self.instrumentation:
+            instrument_serializers()
+
+    def __call__(self, request):
+        record = RequestRecord(track_shapes=self.instrumentation)
+        token = _current_record.set(record)
+        start = time.perf_counter()
+        if self.prometheus:
+            metrics.REQUESTS_IN_PROGRESS.inc()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current_record.reset(token)
+            if self.prometheus:
+                metrics.REQUESTS_IN_PROGRESS.dec()
+        total = time.perf_counter() - start
+        if self.prometheus:
+            self.observe(request, response, record, total)
+        if self.instrumentation:
+            self.report(request, response, record, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        record = _current_record.get()
+        if record is not None:
+            record.view = view_name(view_func, request.method)
+
+    def observe(self, request, response, record, total):
+        view = record.view or "unmatched"
+        metrics.REQUEST_DURATION.labels(view, request.method).observe(total)
+        metrics.REQUESTS.labels(
+            view, request.method, response.status_code
+        ).inc()
+        metrics.REQUEST_QUERIES.labels(view).observe(record.queries)
+        metrics.REQUEST_DB_DURATION.labels(view).observe(record.db_time)
+
+    def report(self, request, response, record, total):
+        view = record.view or request.path
+        total_ms = total * 1000
+        db_ms = record.db_time * 1000
+        serializer_ms = record.serializer_time * 1000
+        response["Server-Timing"] = ", ".join((
+            f'db;dur={db_ms:.2f};desc="{record.queries} queries"',
+            f"serializer;dur={serializer_ms:.2f}",
+            f"total;dur={total_ms:.2f}",
+        ))
+        duplicates = {
+            shape: count for shape, count in record.shapes.items()
+            if count > self.duplicate_threshold
+        }
+        metrics_store.add(
+            view, (total_ms, db_ms, serializer_ms, record.queries)
+        )
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "status": response.status_code,
+            "queries": record.queries,
+            "db_ms": round(db_ms, 2),
+            "serializer_ms": round(serializer_ms, 2),
+            "total_ms": round(total_ms, 2),
+            "duplicate_queries": sum(duplicates.values()),
+        }, ensure_ascii=False))
+        for shape, count in duplicates.items():
+            logger.warning(
+                "Повторяющийся запрос в %s (%s раз): %s", view, count, shape
+            )
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Выбирает реплику для чтения в GET, HEAD и OPTIONS. Если запрос
+    пользователя что-то записал, в общем кеше REPLICA_PIN_CACHE на
+    REPLICA_PIN_SECONDS секунд остаётся отметка с его id, и пока она
+    есть, его запросы с любого устройства читают с основной базы: свои
+    изменения видны сразу, несмотря на отставание реплик.
+    """
+
+    def __init__(self, get_response):
+        self.replicas = settings.DATABASE_REPLICAS
+        if not self.replicas:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pins = caches[settings.REPLICA_PIN_CACHE]
+        self.pin_seconds = settings.REPLICA_PIN_SECONDS
+
+    def __call__(self, request):
+        replica = None
+        if request.method in SAFE_METHODS and not self.is_pinned(request):
+            replica = random.choice(self.replicas)
+        state = RoutingState(replica)
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        user = getattr(request, "user", None)
+        if state.wrote and user is not None and user.pk is not None:
+            self.pins.set(self.pin_key(user.pk), 1, self.pin_seconds)
+        return response
+
+    def pin_key(self, user_id):
+        return f"replica_pin:{user_id}"
+
+    def is_pinned(self, request):
+        user_id = token_user_id(request)
+        return user_id is not None and (
+            self.pins.get(self.pin_key(user_id)) is not None
+        )
+
+
+class CompressionMiddleware:
+    """
+    Сжимает JSON-ответы API на GET и HEAD больше COMPRESSION_MIN_SIZE:
+    brotli, если клиент его принимает и библиотека установлена, иначе gzip.
+    HTML админки и ответы с токенами (POST) не сжимаются, чтобы длина
+    сжатого ответа не раскрывала секреты (BREACH). В gzip, как и в
+    GZipMiddleware, добавляются случайные байты.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.brotli_quality = settings.COMPRESSION_BROTLI_QUALITY
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or request.method not in ("GET", "HEAD")
+            or not request.path.startswith(COMPRESSIBLE_PATH)
+            or response.has_header("Content-Encoding")
+            or len(response.content) < self.min_size
+            or not response.get("Content-Type", "").startswith(
+                COMPRESSIBLE_TYPES
+            )
+        ):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        accepted = accepted_encodings(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if brotli is not None and "br" in accepted:
+            encoding = "br"
+            content = brotli.compress(
+                response.content, quality=self.brotli_quality
+            )
+        elif "gzip" in accepted:
+            encoding = "gzip"
+            content = compress_string(
+                response.content, max_random_bytes=GZIP_MAX_RANDOM_BYTES
+            )
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = encoding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
@@ -1,8 +1,103 @@
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+
+POSITION_SEPARATOR = ":"
 
 
 class UserPageNumberPagination(PageNumberPagination):
     page_size = settings.PAGE_SIZE
     page_size_query_param = "limit"
     max_page_size = settings.MAX_PAGE_SIZE
+
+
+class RankingCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация по предрассчитанной оценке рецепта. Позиция в
+    курсоре — пара (оценка, id), поэтому рецепты с одинаковой оценкой
+    не теряются и не повторяются на границе страниц, а смещение
+    не нужно.
+    """
+
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = "limit"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def __init__(self, field):
+        self.field = field
+        self.ordering = (f"-{field}", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor else None
+        if reverse:
+            queryset = queryset.order_by(self.field, "id")
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            score, pk = position
+            lookup = "gt" if reverse else "lt"
+            queryset = queryset.filter(
+                Q(**{f"{self.field}__{lookup}": score})
+                | Q(**{self.field: score, f"id__{lookup}": pk})
+            )
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = (
+            self._get_position_from_instance(self.page[-1], self.ordering)
+            if self.page else self.cursor.position
+        )
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=position)
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = (
+            self._get_position_from_instance(self.page[0], self.ordering)
+            if self.page else self.cursor.position
+        )
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=True, position=position)
+        )
+
+    def _get_position_from_instance(self, instance, ordering):
+        return getattr(instance, self.field), instance.pk
+
+    def encode_cursor(self, cursor):
+        score, pk = cursor.position
+        return super().encode_cursor(cursor._replace(
+            position=f"{score!r}{POSITION_SEPARATOR}{pk}"
+        ))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            score, pk = cursor.position.split(POSITION_SEPARATOR)
+            return cursor._replace(position=(float(score), int(pk)))
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
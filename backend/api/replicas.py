@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+routing_state = ContextVar("db_routing_state", default=None)
+
+
+class RoutingState:
+    """
+    Реплика, выбранная для запроса. После первой записи запрос читает
+    только с основной базы.
+    """
+
+    __slots__ = ("replica", "wrote")
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+
+@contextmanager
+def untracked_writes():
+    """
+    Записи внутри блока не считаются записями пользователя: после них
+    запрос продолжает читать с реплики и пользователь не закрепляется
+    за основной базой. Для служебных счётчиков вроде переходов по
+    коротким ссылкам.
+    """
+    state = routing_state.get()
+    wrote = state is not None and state.wrote
+    try:
+        yield
+    finally:
+        if state is not None:
+            state.wrote = wrote
+
+
+class ReplicaRouter:
+    """
+    Чтение в безопасных запросах API идёт на реплику, выбранную
+    ReplicaRoutingMiddleware, всё остальное — на основную базу.
+    Команды и воркер фоновых задач всегда работают с основной базой.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if (
+            state is None
+            or state.replica is None
+            or state.wrote
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -1,17 +1,30 @@
+from operator import attrgetter
+
 from django.contrib.auth import authenticate, get_user_model
 from django.db import transaction
+from django.urls import reverse
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import AccessToken
 
-from food.models import IngredientInRecipe, Ingredients, Recipe, Tags
-from users.models import Follow
+from background.models import Job
+from food.constants import BATCH_RECIPES_MAX
+from food.ingredient_catalog import ingredient_catalog
+from food.models import (RECIPE_READ_FIELDS, FavoriteRecipe,
+                         IngredientInRecipe, Ingredients, Recipe,
+                         ShoppingListRecipe, Tags)
+from food.timeline import enqueue_fan_out
+from users.models import USER_READ_FIELDS, Follow
 from .fields import Base64ImageField
+from .thumbnails import enqueue_thumbnails, thumbnail_url
+from .utils import discard_shopping_cart_pdfs
 
 User = get_user_model()
 
 
 class DetailUserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
+    avatar = Base64ImageField(read_only=True)
 
     def get_is_subscribed(self, obj):
         request = self.context.get("request")
@@ -19,7 +32,7 @@ class DetailUserSerializer(serializers.ModelSerializer):
             request
             and request.user.is_authenticated
             and Follow.objects.filter(
-                user=request.user, following=obj
+                user_id=request.user.pk, following=obj
             ).exists()
         )
 
@@ -56,7 +69,12 @@ class FollowUserSerializer(DetailUserSerializer):
         if limit:
             queryset = queryset[:limit]
 
-        return RecipeShortSerializer(queryset, many=True, read_only=True).data
+        return RecipeShortSerializer(
+            queryset,
+            many=True,
+            read_only=True,
+            context={"image_size": self.context.get("image_size")},
+        ).data
 
     class Meta:
         model = User
@@ -76,6 +94,11 @@ class FollowUserSerializer(DetailUserSerializer):
 class UpdateAvatarSerializer(serializers.ModelSerializer):
     avatar = Base64ImageField(required=True, allow_null=False)
 
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        enqueue_thumbnails(instance.avatar)
+        return instance
+
     class Meta:
         model = User
         fields = ("avatar",)
@@ -103,14 +126,46 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "slug")
 
 
+class CatalogIngredientField(serializers.PrimaryKeyRelatedField):
+    """
+    id ингредиента проверяется по справочнику в памяти процесса.
+    В базу поле идёт только за ингредиентами, которых ещё нет в срезе;
+    удалённые, но оставшиеся в устаревшем срезе, отсекает одна проверка
+    в add_ingredients перед записью.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            record = ingredient_catalog.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if record is None:
+            return super().to_internal_value(data)
+        return Ingredients(
+            id=record.id,
+            name=record.name,
+            measurement_unit=record.measurement_unit,
+        )
+
+
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    """Название и единица берутся из справочника, без join с ингредиентами."""
+
+    id = CatalogIngredientField(
         queryset=Ingredients.objects.all(), source="ingredient"
     )
-    name = serializers.CharField(source="ingredient.name", read_only=True)
-    measurement_unit = serializers.CharField(
-        source="ingredient.measurement_unit", read_only=True
-    )
+    name = serializers.SerializerMethodField()
+    measurement_unit = serializers.SerializerMethodField()
+
+    def get_name(self, item):
+        record = ingredient_catalog.get(item.ingredient_id, refresh=True)
+        return record and record.name
+
+    def get_measurement_unit(self, item):
+        record = ingredient_catalog.get(item.ingredient_id, refresh=True)
+        return record and record.measurement_unit
 
     class Meta:
         model = IngredientInRecipe
@@ -132,7 +187,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         return (
             request
             and request.user.is_authenticated
-            and request.user.favorites.filter(pk=obj.pk).exists()
+            and FavoriteRecipe.objects.filter(
+                user_id=request.user.pk, recipe=obj
+            ).exists()
         )
 
     def get_is_in_shopping_cart(self, obj):
@@ -140,7 +197,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         return (
             request
             and request.user.is_authenticated
-            and request.user.purchases.filter(pk=obj.pk).exists()
+            and ShoppingListRecipe.objects.filter(
+                user_id=request.user.pk, recipe=obj
+            ).exists()
         )
 
     class Meta:
@@ -197,6 +256,22 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         return attrs
 
     def add_ingredients(self, ingredients_data, recipe):
+        ingredient_ids = {item["ingredient"].id for item in ingredients_data}
+        existing = set(Ingredients.objects.filter(
+            pk__in=ingredient_ids
+        ).values_list("pk", flat=True))
+        if existing != ingredient_ids:
+            # Справочник в другом процессе мог не узнать об удалении.
+            ingredient_catalog.invalidate()
+            message = CatalogIngredientField.default_error_messages[
+                "does_not_exist"
+            ]
+            raise serializers.ValidationError({"ingredients": [
+                {}
+                if item["ingredient"].id in existing
+                else {"id": [message.format(pk_value=item["ingredient"].id)]}
+                for item in ingredients_data
+            ]})
         IngredientInRecipe.objects.bulk_create(
             [
                 IngredientInRecipe(
@@ -206,6 +281,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
                 for item in ingredients_data
             ]
         )
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
 
     @transaction.atomic
     def create(self, validated_data):
@@ -216,6 +292,8 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         )
         self.add_ingredients(ingredients_data, recipe)
         recipe.tags.set(tags_data)
+        enqueue_fan_out(recipe)
+        enqueue_thumbnails(recipe.image)
         return recipe
 
     @transaction.atomic
@@ -223,9 +301,15 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         ingredients_data = validated_data.pop('ingredients', None)
         tags_data = validated_data.pop('tags', None)
         instance = super().update(instance, validated_data)
+        if "image" in validated_data:
+            enqueue_thumbnails(instance.image)
         instance.tags.set(tags_data)
         instance.recipe_ingredients.all().delete()
         self.add_ingredients(ingredients_data, instance)
+        user_ids = list(ShoppingListRecipe.objects.filter(
+            recipe=instance
+        ).values_list("user_id", flat=True))
+        transaction.on_commit(lambda: discard_shopping_cart_pdfs(user_ids))
         return instance
 
     class Meta:
@@ -249,7 +333,180 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image = Base64ImageField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = ("id", "name", "image", "cooking_time")
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_RECIPES_MAX,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
+def image_url(image, request, size=None):
+    if not image:
+        return None
+    url = image.url if size is None else thumbnail_url(image, size)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def user_flag(request, value, default_query):
+    """Повторяет логику `request and user.is_authenticated and exists()`."""
+    if not request:
+        return request
+    if not request.user.is_authenticated:
+        return False
+    if value is None:
+        return default_query().exists()
+    return value
+
+
+def user_representation(user, request, is_subscribed=None, image_size=None):
+    return {
+        "email": user.email,
+        "id": user.id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "is_subscribed": user_flag(
+            request,
+            is_subscribed,
+            lambda: Follow.objects.filter(
+                user_id=request.user.pk, following=user
+            ),
+        ),
+        "avatar": image_url(user.avatar, request, image_size),
+    }
+
+
+class SparseFieldsSerializer(serializers.BaseSerializer):
+    """
+    Быстрый сериализатор чтения. context["fields"] задаёт выводимые поля
+    и их порядок, без него выводятся все field_names. Значение поля
+    берётся из метода get_<поле>, а при его отсутствии из атрибута.
+    """
+
+    field_names = ()
+
+    @cached_property
+    def request(self):
+        return self.context.get("request")
+
+    @cached_property
+    def image_size(self):
+        return self.context.get("image_size")
+
+    @cached_property
+    def getters(self):
+        names = self.context.get("fields")
+        if names is None:
+            names = self.field_names
+        return [
+            (name, getattr(self, f"get_{name}", None) or attrgetter(name))
+            for name in names
+        ]
+
+    def to_representation(self, instance):
+        return {name: getter(instance) for name, getter in self.getters}
+
+
+class UserReadSerializer(SparseFieldsSerializer):
+    """Быстрое чтение пользователя, вывод совпадает с DetailUserSerializer."""
+
+    field_names = USER_READ_FIELDS
+
+    def get_is_subscribed(self, instance):
+        return user_flag(
+            self.request,
+            getattr(instance, "is_subscribed", None),
+            lambda: Follow.objects.filter(
+                user_id=self.request.user.pk, following=instance
+            ),
+        )
+
+    def get_avatar(self, instance):
+        return image_url(instance.avatar, self.request, self.image_size)
+
+
+class RecipeReadSerializer(SparseFieldsSerializer):
+    """
+    Быстрое чтение рецепта, вывод совпадает с RecipeSerializer.
+    Рассчитан на queryset из Recipe.objects.for_read(user, fields).
+    """
+
+    field_names = RECIPE_READ_FIELDS
+
+    def get_tags(self, instance):
+        return [
+            {"id": tag.id, "name": tag.name, "slug": tag.slug}
+            for tag in instance.tags.all()
+        ]
+
+    def get_author(self, instance):
+        return user_representation(
+            instance.author,
+            self.request,
+            getattr(instance, "author_is_subscribed", None),
+            self.image_size,
+        )
+
+    def get_ingredients(self, instance):
+        ingredients = []
+        for item in instance.recipe_ingredients.all():
+            record = ingredient_catalog.get(item.ingredient_id, refresh=True)
+            ingredients.append({
+                "id": item.ingredient_id,
+                "name": record and record.name,
+                "measurement_unit": record and record.measurement_unit,
+                "amount": item.amount,
+            })
+        return ingredients
+
+    def get_is_favorited(self, instance):
+        return user_flag(
+            self.request,
+            getattr(instance, "is_favorited", None),
+            lambda: FavoriteRecipe.objects.filter(
+                user_id=self.request.user.pk, recipe=instance
+            ),
+        )
+
+    def get_is_in_shopping_cart(self, instance):
+        return user_flag(
+            self.request,
+            getattr(instance, "is_in_shopping_cart", None),
+            lambda: ShoppingListRecipe.objects.filter(
+                user_id=self.request.user.pk, recipe=instance
+            ),
+        )
+
+    def get_image(self, instance):
+        return image_url(instance.image, self.request, self.image_size)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    def get_download_url(self, obj):
+        if not obj.artifact:
+            return None
+        return self.context["request"].build_absolute_uri(
+            reverse("job-download", args=[obj.pk])
+        )
+
+    class Meta:
+        model = Job
+        fields = (
+            "id", "name", "status", "attempts", "result", "download_url",
+            "created_at", "finished_at",
+        )
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+
+from background.jobs import task
+from foodgram import metrics
+from .thumbnails import make_thumbnail
+from .utils import generate_shopping_cart_pdf
+
+User = get_user_model()
+
+
+@task("shopping_cart_pdf")
+def shopping_cart_pdf(user_id):
+    with metrics.timer(metrics.PDF_DURATION):
+        buffer = generate_shopping_cart_pdf(User.objects.get(pk=user_id))
+    metrics.PDF_SIZE.observe(buffer.getbuffer().nbytes)
+    return ContentFile(buffer.getvalue(), name="shopping_cart.pdf")
+
+
+@task("thumbnails")
+def thumbnails(path):
+    for width, height in settings.THUMBNAIL_SIZES.values():
+        make_thumbnail(path, width, height)
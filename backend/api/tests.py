@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+
+from food.ingredient_catalog import ingredient_catalog
+from food.models import (FavoriteRecipe, IngredientInRecipe, Ingredients,
+                         Recipe, ShoppingListRecipe, Tags)
+from users.models import Follow
+from .serializers import (DetailUserSerializer, RecipeReadSerializer,
+                          RecipeSerializer, UserReadSerializer)
+
+User = get_user_model()
+
+
+class ReadSerializersTests(APITestCase):
+    """
+    Быстрые сериализаторы чтения должны отдавать тот же JSON, что и
+    RecipeSerializer и DetailUserSerializer, для гостя и для
+    пользователя с избранным, корзиной и подписками.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f"user{number}@example.com",
+                username=f"user{number}",
+                first_name=f"Имя {number}",
+                last_name=f"Фамилия {number}",
+                password="password",
+            )
+            for number in range(3)
+        ]
+        cls.users[1].avatar = "users/avatar.png"
+        cls.users[1].save()
+        tags = [
+            Tags.objects.create(name=name, slug=slug)
+            for name, slug in (("Завтрак", "breakfast"), ("Обед", "lunch"))
+        ]
+        ingredients = [
+            Ingredients.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (("мука", "г"), ("молоко", "мл"), ("яйца", "шт"))
+        ]
+        cls.recipes = []
+        for number in range(4):
+            recipe = Recipe.objects.create(
+                author=cls.users[number % 2],
+                name=f"Рецепт {number}",
+                image=f"recipes/images/{number}.png",
+                text="Описание",
+                cooking_time=5 + number,
+            )
+            recipe.tags.set(tags[:number % 2 + 1])
+            IngredientInRecipe.objects.bulk_create([
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=10 * number
+                )
+                for ingredient in ingredients[:number % 3 + 1]
+            ])
+            cls.recipes.append(recipe)
+        reader = cls.users[2]
+        FavoriteRecipe.objects.create(user=reader, recipe=cls.recipes[0])
+        ShoppingListRecipe.objects.create(user=reader, recipe=cls.recipes[1])
+        ShoppingListRecipe.objects.create(user=reader, recipe=cls.recipes[2])
+        Follow.objects.create(user=reader, following=cls.users[1])
+
+    def setUp(self):
+        # Сигналы сбрасывают справочник после коммита, а TestCase
+        # не коммитит.
+        ingredient_catalog.invalidate()
+
+    def make_request(self, user):
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        request.user = user
+        return request
+
+    def render(self, serializer_class, objects, request):
+        return JSONRenderer().render(serializer_class(
+            objects, many=True, context={"request": request}
+        ).data)
+
+    def readers(self):
+        return (("гость", AnonymousUser()), ("пользователь", self.users[2]))
+
+    def test_recipe_read_serializer_matches_model_serializer(self):
+        for label, user in self.readers():
+            with self.subTest(label):
+                request = self.make_request(user)
+                self.assertEqual(
+                    self.render(
+                        RecipeReadSerializer,
+                        Recipe.objects.for_read(user).order_by("id"),
+                        request,
+                    ),
+                    self.render(
+                        RecipeSerializer,
+                        Recipe.objects.order_by("id"),
+                        request,
+                    ),
+                )
+
+    def test_user_read_serializer_matches_model_serializer(self):
+        for label, user in self.readers():
+            with self.subTest(label):
+                request = self.make_request(user)
+                self.assertEqual(
+                    self.render(
+                        UserReadSerializer,
+                        User.objects.with_is_subscribed(user).order_by("id"),
+                        request,
+                    ),
+                    self.render(
+                        DetailUserSerializer,
+                        User.objects.order_by("id"),
+                        request,
+                    ),
+                )
+
+    def test_recipe_detail_matches_model_serializer(self):
+        client = APIClient()
+        client.force_authenticate(self.users[2])
+        request = self.make_request(self.users[2])
+        for recipe in self.recipes:
+            with self.subTest(recipe=recipe.pk):
+                response = client.get(f"/api/recipes/{recipe.pk}/")
+                self.assertEqual(response.status_code, 200)
+                expected = RecipeSerializer(
+                    recipe, context={"request": request}
+                ).data
+                self.assertEqual(response.json(), dict(expected))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SharedRateThrottle(SimpleRateThrottle):
+    """Счётчики в общем для процессов кеше THROTTLE_CACHE."""
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE]
+
+
+class LoginRateThrottle(SharedRateThrottle):
+    scope = "login"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class LoginEmailRateThrottle(SharedRateThrottle):
+    scope = "login_email"
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, dict):
+            return None
+        email = request.data.get("email")
+        if not isinstance(email, str) or not email:
+            return None
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": email.strip().lower(),
+        }
+
+
+class ExportRateThrottle(SharedRateThrottle):
+    scope = "export"
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
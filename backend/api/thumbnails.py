@@ -0,0 +1,64 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.crypto import constant_time_compare, salted_hmac
+from PIL import Image, ImageOps
+
+from background.jobs import enqueue
+
+THUMBNAIL_DIR = "thumb"
+THUMBNAIL_MAX_AGE = 30 * 24 * 60 * 60
+
+
+def thumbnail_signature(path, width, height):
+    return salted_hmac(
+        "api.thumbnails", f"{width}x{height}/{path}"
+    ).hexdigest()[:16]
+
+
+def valid_signature(signature, path, width, height):
+    return constant_time_compare(
+        signature, thumbnail_signature(path, width, height)
+    )
+
+
+def thumbnail_name(path, width, height):
+    """
+    Имя уменьшенной копии в хранилище. Совпадает с путём URL, поэтому
+    готовую копию nginx отдаёт сам через try_files.
+    """
+    signature = thumbnail_signature(path, width, height)
+    return f"{THUMBNAIL_DIR}/{width}x{height}/{signature}/{path}"
+
+
+def thumbnail_url(image, size):
+    return default_storage.url(thumbnail_name(image.name, *size))
+
+
+def make_thumbnail(path, width, height):
+    """Создаёт копию, вписанную в width x height, если её ещё нет."""
+    name = thumbnail_name(path, width, height)
+    if default_storage.exists(name):
+        return name
+    with default_storage.open(path) as source, Image.open(source) as image:
+        image_format = image.format
+        image.draft("RGB", (width, height))
+        thumbnail = ImageOps.exif_transpose(image)
+        thumbnail.thumbnail((width, height))
+        if image_format == "JPEG" and thumbnail.mode not in ("RGB", "L"):
+            thumbnail = thumbnail.convert("RGB")
+        buffer = BytesIO()
+        thumbnail.save(buffer, format=image_format, optimize=True)
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+    return name
+
+
+def enqueue_thumbnails(image):
+    """Готовит уменьшенные копии в фоне после коммита транзакции."""
+    transaction.on_commit(lambda: enqueue(
+        "thumbnails", idempotency_key=f"thumbnails:{image.name}",
+        path=image.name,
+    ))
@@ -1,8 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .views import (IngredientsViewSet, LogoutView, RecipeViewSet,
+from .views import (ExportView, IngredientsViewSet, JobViewSet, LoginView,
+                    LogoutView, MetricsView, RecipeViewSet,
                     TagsReadOnlyViewSet, UserViewSet)
 
 router = DefaultRouter()
@@ -10,16 +10,23 @@ router.register("users", UserViewSet)
 router.register("recipes", RecipeViewSet)
 router.register("tags", TagsReadOnlyViewSet)
 router.register("ingredients", IngredientsViewSet)
+router.register("jobs", JobViewSet, basename="job")
 
 urlpatterns = [
     path(
         "auth/token/login/",
-        TokenObtainPairView.as_view(),
+        LoginView.as_view(),
         name="token_obtain_pair",
     ),
     path(
         "auth/token/logout/",
         LogoutView.as_view(),
     ),
+    path(
+        "export/<str:name>.<str:output_format>",
+        ExportView.as_view(),
+        name="export",
+    ),
+    path("_metrics/", MetricsView.as_view(), name="metrics"),
     path("", include(router.urls)),
 ]
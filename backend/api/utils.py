@@ -1,13 +1,27 @@
+import hashlib
 import os
 from io import BytesIO
 
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
+from background.models import Job
+from food.ingredient_catalog import ingredient_catalog
+from food.models import ShoppingListRecipe
+
+
+def ingredient_name(ingredient_id):
+    record = ingredient_catalog.get(ingredient_id, refresh=True)
+    return record and record.name
 
 
 def generate_shopping_cart_pdf(user):
+    """
+    reportlab импортируется здесь: PDF собирает воркер фоновых задач,
+    а процессам gunicorn он нужен редко.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
     buffer = BytesIO()
     p = canvas.Canvas(buffer, pagesize=letter)
     width, height = letter
@@ -30,10 +44,9 @@ def generate_shopping_cart_pdf(user):
         y_position -= 20
         ingredients = ", ".join(
             [
-                f"{amount.amount} {amount.ingredient.name}"
-                for amount in recipe.recipe_ingredients.select_related(
-                    "ingredient"
-                ).all()
+                f"{amount.amount} {name}"
+                for amount in recipe.recipe_ingredients.all()
+                if (name := ingredient_name(amount.ingredient_id))
             ]
         )
         p.drawString(100, y_position, f"Ингредиенты: {ingredients}")
@@ -62,3 +75,30 @@ def generate_shopping_cart_pdf(user):
     p.save()
     buffer.seek(0)
     return buffer
+
+
+def shopping_cart_fingerprint(user_id):
+    """
+    Отпечаток корзины: отсортированные id записей корзины и время
+    последней правки её рецептов.
+    """
+    rows = ShoppingListRecipe.objects.filter(user_id=user_id).values_list(
+        "pk", "recipe__updated_at"
+    )
+    ids = sorted(pk for pk, _ in rows)
+    modified = max((updated_at for _, updated_at in rows), default=None)
+    return hashlib.md5(
+        f"{ids}|{modified}".encode(), usedforsecurity=False
+    ).hexdigest()
+
+
+def discard_shopping_cart_pdfs(user_ids):
+    """Удаляет готовые PDF корзин пользователей вместе с файлами."""
+    jobs = list(Job.objects.filter(
+        name="shopping_cart_pdf", user_id__in=user_ids, status=Job.DONE
+    ).only("pk", "artifact"))
+    if not jobs:
+        return
+    for job in jobs:
+        job.artifact.delete(save=False)
+    Job.objects.filter(pk__in=[job.pk for job in jobs]).delete()
@@ -1,43 +1,180 @@
+import hashlib
+from math import ceil
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
 from django.db.models import Count
-from django.http import HttpResponse
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseForbidden, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
+from PIL.Image import DecompressionBombError
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import (AllowAny, IsAuthenticated,
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework_simplejwt.views import TokenObtainPairView
 
+from background.jobs import claim_job, enqueue, run_job
+from background.models import Job
 from users.models import Follow
+from food.constants import (RANKING_FIELDS, RECOMMENDATIONS_LIMIT,
+                            RECOMMENDATIONS_MAX_LIMIT, WHAT_CAN_I_COOK_LIMIT,
+                            WHAT_CAN_I_COOK_MAX_LIMIT)
+from food.exports import EXPORTS, FORMATS, PUBLIC_EXPORTS, export_chunks
+from food.ingredient_index import ingredient_index
+from food import timeline
+from food.recommendations import recommended_recipe_ids
+from foodgram import metrics
 from food.models import (FavoriteRecipe, Ingredients, Recipe,
-                         ShoppingListRecipe, Tags)
+                         RecipeLinkHits, ShoppingListRecipe, Tags)
+from .authentication import check_active
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import UserPageNumberPagination
+from .middleware import metrics_store
+from .pagination import RankingCursorPagination, UserPageNumberPagination
 from .permissions import IsAuthorOrReadOnly
+from .replicas import untracked_writes
 from .serializers import (CreateRecipeSerializer,
                           DetailUserSerializer, FollowUserSerializer,
-                          IngredientSerializer, RecipeSerializer,
+                          IngredientSerializer, JobSerializer,
+                          RecipeIdsSerializer, RecipeReadSerializer,
+                          RecipeSerializer,
                           RecipeShortSerializer, TagSerializer,
-                          UpdateAvatarSerializer)
-from .utils import generate_shopping_cart_pdf
+                          UpdateAvatarSerializer, UserReadSerializer)
+from .throttling import (ExportRateThrottle, LoginEmailRateThrottle,
+                         LoginRateThrottle)
+from .thumbnails import (THUMBNAIL_MAX_AGE, make_thumbnail,
+                         valid_signature)
+from .utils import discard_shopping_cart_pdfs, shopping_cart_fingerprint
 
 User = get_user_model()
 
 
+def export_metrics(request):
+    if not metrics.is_allowed(request):
+        return HttpResponseForbidden()
+    content, content_type = metrics.export()
+    return HttpResponse(content, content_type=content_type)
+
+
+def job_retry_after(job):
+    """Секунды до следующей попытки задачи для заголовка Retry-After."""
+    if job.status == Job.PENDING:
+        delay = (job.run_after - timezone.now()).total_seconds()
+        return max(ceil(delay), 1)
+    return settings.SHOPPING_CART_RETRY_AFTER
+
+
 def redirect_to_recipe(request, recipe_short_code):
     try:
-        recipe = Recipe.objects.get(short_code=recipe_short_code)
+        recipe = Recipe.objects.only("id").get(short_code=recipe_short_code)
+        with untracked_writes():
+            RecipeLinkHits.record(recipe.id)
         return redirect(f"/recipes/{recipe.id}")
     except Recipe.DoesNotExist:
         return redirect("/not-found/")
 
 
-class UserViewSet(UserViewSet):
+def split_fields(value):
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+def query_int(request, name, default, max_value):
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise ValidationError({name: "Ожидается целое число."})
+    return max(1, min(value, max_value))
+
+
+def thumbnail(request, width, height, signature, path):
+    """
+    Уменьшенная копия картинки по подписанной ссылке. Копия создаётся
+    один раз, дальше nginx отдаёт её с диска без обращения к бэкенду.
+    """
+    if not valid_signature(signature, path, width, height):
+        raise Http404
+    try:
+        name = make_thumbnail(path, width, height)
+    except (OSError, SuspiciousFileOperation, DecompressionBombError):
+        raise Http404
+    response = FileResponse(default_storage.open(name))
+    patch_cache_control(response, public=True, max_age=THUMBNAIL_MAX_AGE)
+    return response
+
+
+class ImageSizeMixin:
+    """
+    Параметр image_size= с именем из THUMBNAIL_SIZES: ссылки на картинки
+    в ответе ведут на уменьшенные копии.
+    """
+
+    @cached_property
+    def image_size(self):
+        name = self.request.query_params.get("image_size")
+        if name is None:
+            return None
+        if name not in settings.THUMBNAIL_SIZES:
+            raise ValidationError({"image_size": (
+                "Допустимые размеры: "
+                f"{', '.join(settings.THUMBNAIL_SIZES)}."
+            )})
+        return settings.THUMBNAIL_SIZES[name]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["image_size"] = self.image_size
+        return context
+
+
+class SparseFieldsMixin:
+    """
+    Параметры fields= и omit= (через запятую) для list и retrieve:
+    ответ содержит только запрошенные поля сериализатора чтения.
+    """
+
+    sparse_fields_actions = ("list", "retrieve")
+
+    @cached_property
+    def requested_fields(self):
+        params = self.request.query_params
+        if self.action not in self.sparse_fields_actions or (
+            "fields" not in params and "omit" not in params
+        ):
+            return None
+        available = self.get_serializer_class().field_names
+        fields = split_fields(params.get("fields")) or list(available)
+        omit = split_fields(params.get("omit"))
+        unknown = [name for name in fields + omit if name not in available]
+        if unknown:
+            raise ValidationError(
+                {"fields": f"Неизвестные поля: {', '.join(unknown)}."}
+            )
+        return tuple(
+            name for name in available
+            if name in fields and name not in omit
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"] = self.requested_fields
+        return context
+
+
+class UserViewSet(ImageSizeMixin, SparseFieldsMixin, UserViewSet):
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = DetailUserSerializer
@@ -45,11 +182,20 @@ class UserViewSet(UserViewSet):
     http_method_names = ["get", "post", "put", "delete"]
 
     def get_queryset(self):
+        if self.action in ("list", "retrieve"):
+            return User.objects.for_read(
+                self.request.user, self.requested_fields
+            )
         queryset = User.objects.annotate(
             recipes_count=Count("recipe", distinct=True),
         ).prefetch_related("recipe")
         return queryset
 
+    def get_serializer_class(self):
+        if self.action in ("list", "retrieve"):
+            return UserReadSerializer
+        return super().get_serializer_class()
+
     @action(
         detail=False,
         methods=["get"],
@@ -60,6 +206,7 @@ class UserViewSet(UserViewSet):
     )
     def me(self, request, *args, **kwargs):
         user = self.get_queryset().get(pk=request.user.pk)
+        check_active(user)
         serializer = self.get_serializer(user)
         return Response(serializer.data)
 
@@ -107,15 +254,16 @@ class UserViewSet(UserViewSet):
                     {"detail": "Вы уже подписаны!"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            timeline.follow(user.pk, following.pk)
             serializer = FollowUserSerializer(
-                following,
-                context={"request": request}
+                following, context=self.get_serializer_context()
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         deleted_count, _ = Follow.objects.filter(
             user=user, following=following
         ).delete()
         if deleted_count:
+            timeline.unfollow(user.pk, following.pk)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -128,15 +276,17 @@ class UserViewSet(UserViewSet):
         filter_backends=(DjangoFilterBackend,),
     )
     def subscriptions(self, request):
-        queryset = self.get_queryset().filter(followers__user=request.user)
+        queryset = self.get_queryset().filter(
+            followers__user_id=request.user.pk
+        )
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = FollowUserSerializer(
-                page, many=True, context={"request": request}
+                page, many=True, context=self.get_serializer_context()
             )
             return self.get_paginated_response(serializer.data)
         serializer = FollowUserSerializer(
-            queryset, many=True, context={"request": request}
+            queryset, many=True, context=self.get_serializer_context()
         )
         return Response(serializer.data)
 
@@ -146,10 +296,8 @@ class TagsReadOnlyViewSet(ReadOnlyModelViewSet):
     serializer_class = TagSerializer
 
 
-class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.all().prefetch_related(
-        "favorited_by", "shopping_cart_by"
-    )
+class RecipeViewSet(ImageSizeMixin, SparseFieldsMixin, ModelViewSet):
+    queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (
         IsAuthenticatedOrReadOnly,
@@ -158,10 +306,61 @@ class RecipeViewSet(ModelViewSet):
     pagination_class = UserPageNumberPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    read_actions = (
+        "list", "retrieve", "what_can_i_cook", "similar", "recommended",
+        "feed",
+    )
+    sparse_fields_actions = read_actions
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.read_actions:
+            return queryset.for_read(
+                self.request.user,
+                self.requested_fields,
+                getattr(self.paginator, "columns", ()),
+            )
+        return queryset
+
+    @cached_property
+    def paginator(self):
+        field = RANKING_FIELDS.get(self.request.query_params.get("ordering"))
+        if self.action == "list" and field is not None:
+            return RankingCursorPagination(field)
+        return super().paginator
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag()
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def get_list_etag(self):
+        queryset = self.filter_queryset(super().get_queryset())
+        state = queryset.list_state(self.request.user)
+        fingerprint = "|".join(
+            str(value) for value in (
+                self.request.get_full_path(),
+                self.request.user.pk,
+                self.request.accepted_renderer.format,
+                *state.values(),
+            )
+        )
+        return 'W/"{}"'.format(
+            hashlib.md5(fingerprint.encode(), usedforsecurity=False)
+            .hexdigest()
+        )
 
     def get_serializer_class(self):
         if self.request.method in ["POST", "PATCH"]:
             return CreateRecipeSerializer
+        if self.action in self.read_actions:
+            return RecipeReadSerializer
         return RecipeSerializer
 
     @action(
@@ -177,6 +376,93 @@ class RecipeViewSet(ModelViewSet):
 
         return Response({"short-link": full_url}, status=status.HTTP_200_OK)
 
+    @action(
+        methods=("get",),
+        detail=False,
+        permission_classes=(AllowAny,),
+        url_path="what_can_i_cook",
+    )
+    def what_can_i_cook(self, request):
+        try:
+            ingredient_ids = {
+                int(value)
+                for param in request.query_params.getlist("ingredients")
+                for value in param.split(",")
+                if value.strip()
+            }
+        except ValueError:
+            raise ValidationError(
+                {"ingredients": "Ожидаются id ингредиентов через запятую."}
+            )
+        if not ingredient_ids:
+            raise ValidationError(
+                {"ingredients": "Укажите хотя бы один ингредиент."}
+            )
+        limit = query_int(
+            request, "limit", WHAT_CAN_I_COOK_LIMIT, WHAT_CAN_I_COOK_MAX_LIMIT
+        )
+        ingredient_index.sync()
+        matches = ingredient_index.match(ingredient_ids, limit)
+        recipes = self.get_queryset().in_bulk(
+            [match.recipe_id for match in matches]
+        )
+        matches = [match for match in matches if match.recipe_id in recipes]
+        data = self.get_serializer(
+            [recipes[match.recipe_id] for match in matches], many=True
+        ).data
+        for item, match in zip(data, matches):
+            item["coverage"] = round(match.coverage, 3)
+            item["missing_ingredients"] = match.missing
+        return Response(data)
+
+    @action(
+        methods=("get",),
+        detail=True,
+        permission_classes=(AllowAny,),
+        url_path="similar",
+    )
+    def similar(self, request, pk):
+        limit = query_int(
+            request, "limit", RECOMMENDATIONS_LIMIT, RECOMMENDATIONS_MAX_LIMIT
+        )
+        recipes = self.get_queryset().filter(
+            similar_to__recipe_id=pk
+        ).order_by("-similar_to__score")[:limit]
+        data = self.get_serializer(recipes, many=True).data
+        if not data:
+            get_object_or_404(Recipe, pk=pk)
+        return Response(data)
+
+    @action(
+        methods=("get",),
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path="recommended",
+    )
+    def recommended(self, request):
+        limit = query_int(
+            request, "limit", RECOMMENDATIONS_LIMIT, RECOMMENDATIONS_MAX_LIMIT
+        )
+        recipe_ids = recommended_recipe_ids(request.user, limit)
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        return Response(self.get_serializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes], many=True
+        ).data)
+
+    @action(
+        methods=("get",),
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path="feed",
+    )
+    def feed(self, request):
+        queryset = self.get_queryset().filter(
+            timeline.feed_filter(request.user.pk)
+        ).order_by("-pub_date", "-id")
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     def _toggle_relation(self, request, pk, model, relation_name):
         recipe = get_object_or_404(Recipe, pk=pk)
         user = request.user
@@ -186,6 +472,8 @@ class RecipeViewSet(ModelViewSet):
                 user=user, recipe=recipe
             )
             if created:
+                if model is ShoppingListRecipe:
+                    discard_shopping_cart_pdfs([user.pk])
                 serializer = RecipeShortSerializer(recipe)
                 return Response(
                     serializer.data, status=status.HTTP_201_CREATED
@@ -199,6 +487,8 @@ class RecipeViewSet(ModelViewSet):
             user=user, recipe=recipe
         ).delete()
         if deleted_count:
+            if model is ShoppingListRecipe:
+                discard_shopping_cart_pdfs([user.pk])
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {"detail": f"Рецепт не находится в {relation_name}."},
@@ -227,6 +517,97 @@ class RecipeViewSet(ModelViewSet):
             request, pk, ShoppingListRecipe, "корзине"
         )
 
+    def _batch_relation(self, request, model):
+        """
+        Добавление или удаление списка рецептов за постоянное число
+        запросов. В ответе статус для каждого id.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data["recipes"]
+        user = request.user
+        related = model.objects.filter(user=user, recipe_id__in=recipe_ids)
+        present = set(related.values_list("recipe_id", flat=True))
+        if request.method == "POST":
+            found = set(Recipe.objects.filter(
+                pk__in=recipe_ids
+            ).values_list("pk", flat=True))
+            changed = [
+                pk for pk in recipe_ids if pk in found and pk not in present
+            ]
+            model.objects.bulk_create(
+                [model(user=user, recipe_id=pk) for pk in changed],
+                ignore_conflicts=True,
+            )
+            statuses = {pk: "exists" for pk in present}
+            statuses.update((pk, "added") for pk in changed)
+        else:
+            changed = present
+            if changed:
+                related.delete()
+            statuses = {pk: "removed" for pk in changed}
+        if changed and model is ShoppingListRecipe:
+            discard_shopping_cart_pdfs([user.pk])
+        return Response([
+            {"id": pk, "status": statuses.get(pk, "not_found")}
+            for pk in recipe_ids
+        ])
+
+    @action(
+        methods=("post", "delete"),
+        detail=False,
+        url_path="favorite",
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_batch(self, request):
+        return self._batch_relation(request, FavoriteRecipe)
+
+    @action(
+        methods=("post", "delete"),
+        detail=False,
+        url_path="shopping_cart",
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_batch(self, request):
+        return self._batch_relation(request, ShoppingListRecipe)
+
+    @action(
+        methods=("delete",),
+        detail=False,
+        url_path="shopping_cart/clear",
+        permission_classes=(IsAuthenticated,),
+    )
+    def clear_shopping_cart(self, request):
+        deleted_count, _ = ShoppingListRecipe.objects.filter(
+            user=request.user
+        ).delete()
+        if deleted_count:
+            discard_shopping_cart_pdfs([request.user.pk])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        methods=("post",),
+        detail=False,
+        url_path="shopping_cart/from_favorites",
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_from_favorites(self, request):
+        """Добавляет в корзину все рецепты из избранного."""
+        user = request.user
+        added = list(
+            FavoriteRecipe.objects.filter(user=user)
+            .exclude(recipe__shopping_cart_by__user=user)
+            .order_by("-created_at")
+            .values_list("recipe_id", flat=True)
+        )
+        ShoppingListRecipe.objects.bulk_create(
+            [ShoppingListRecipe(user=user, recipe_id=pk) for pk in added],
+            ignore_conflicts=True,
+        )
+        if added:
+            discard_shopping_cart_pdfs([user.pk])
+        return Response([{"id": pk, "status": "added"} for pk in added])
+
     @action(
         methods=("get",),
         detail=False,
@@ -234,11 +615,56 @@ class RecipeViewSet(ModelViewSet):
         permission_classes=[IsAuthenticated],
     )
     def download_shopping_cart(self, request):
-        buffer = generate_shopping_cart_pdf(self.request.user)
-        response = HttpResponse(buffer, content_type="application/pdf")
-        content_disposition = 'attachment; filename="shopping_cart.pdf"'
-        response["Content-Disposition"] = content_disposition
-        return response
+        """
+        PDF собирается фоновой задачей и хранится, пока не изменится
+        корзина. С заголовком Prefer: respond-async ответ 202 со ссылкой
+        на задачу, иначе PDF собирается сразу в этом процессе, если его
+        ещё нет; если сборка упала или задачу уже выполняет другой
+        процесс, ответ 503 с Retry-After.
+        ETag — отпечаток корзины, If-None-Match с ним даёт 304.
+        """
+        user_id = request.user.pk
+        fingerprint = shopping_cart_fingerprint(user_id)
+        etag = f'"{fingerprint}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+        job = enqueue(
+            "shopping_cart_pdf",
+            owner_id=user_id,
+            idempotency_key=f"shopping_cart_pdf:{user_id}:{fingerprint}",
+            user_id=user_id,
+        )
+        metrics.record_cache("shopping_cart_pdf", job.status == Job.DONE)
+        respond_async = "respond-async" in request.headers.get("Prefer", "")
+        if job.status != Job.DONE and not respond_async and claim_job(
+            job.pk
+        ):
+            run_job(job.pk)
+            job.refresh_from_db()
+        if job.status == Job.DONE:
+            response = FileResponse(
+                job.artifact.open("rb"),
+                as_attachment=True,
+                filename="shopping_cart.pdf",
+                content_type="application/pdf",
+            )
+            response["ETag"] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        if not respond_async:
+            return Response(
+                {"detail": "Список покупок пока не готов, повторите позже."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(job_retry_after(job))},
+            )
+        serializer = JobSerializer(job, context={"request": request})
+        return Response(
+            serializer.data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": reverse("job-detail", args=[job.pk])},
+        )
 
 
 class IngredientsViewSet(ReadOnlyModelViewSet):
@@ -248,6 +674,74 @@ class IngredientsViewSet(ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
 
 
+class JobViewSet(ReadOnlyModelViewSet):
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(user_id=self.request.user.pk)
+
+    @action(methods=("get",), detail=True, url_path="download")
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if not job.artifact:
+            return Response(
+                {"detail": "Результат задачи ещё не готов."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return FileResponse(
+            job.artifact.open("rb"),
+            as_attachment=True,
+            filename=job.artifact.name.rsplit("/", 1)[-1],
+        )
+
+
+class LoginView(TokenObtainPairView):
+    throttle_classes = (LoginRateThrottle, LoginEmailRateThrottle)
+
+
 class LogoutView(APIView):
     def post(self, request):
         return Response({"detail": "Выход выполнен успешно."}, status=204)
+
+
+class ExportView(APIView):
+    """
+    Потоковая выгрузка в NDJSON или CSV, с ?compress=gzip — в gzip.
+    Каталог рецептов и ингредиентов доступен всем, остальное — только
+    данные текущего пользователя.
+    """
+
+    permission_classes = (AllowAny,)
+    throttle_classes = (ExportRateThrottle,)
+
+    def get(self, request, name, output_format):
+        if name not in EXPORTS or output_format not in FORMATS:
+            raise Http404
+        if name not in PUBLIC_EXPORTS and not request.user.is_authenticated:
+            self.permission_denied(request)
+        compress = request.query_params.get("compress") == "gzip"
+        filename = f"{name}.{output_format}"
+        _, content_type = FORMATS[output_format]
+        if compress:
+            filename += ".gz"
+            content_type = "application/gzip"
+        response = StreamingHttpResponse(
+            export_chunks(name, output_format, request.user, compress),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class MetricsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(metrics_store.summary())
+
+    def delete(self, request):
+        metrics_store.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "user", "created_at")
+    list_filter = ("status", "name")
+    search_fields = ("name", "idempotency_key")
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class BackgroundConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "background"
+    verbose_name = "Фоновые задачи"
+
+    def ready(self):
+        autodiscover_modules("tasks")
@@ -0,0 +1,169 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name, max_attempts=3):
+    """Регистрирует функцию как фоновую задачу с именем name."""
+    def decorator(func):
+        TASKS[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(name, *, owner_id=None, idempotency_key=None, **kwargs):
+    """
+    Ставит задачу в очередь. Для существующего ключа идемпотентности новая
+    задача не создаётся: возвращается прежняя, упавшая ставится заново.
+    С TASKS_EAGER задача выполняется сразу в текущем процессе.
+    """
+    _, max_attempts = TASKS[name]
+    defaults = {
+        "name": name,
+        "kwargs": kwargs,
+        "user_id": owner_id,
+        "max_attempts": max_attempts,
+        "run_after": timezone.now(),
+    }
+    if idempotency_key is None:
+        job = Job.objects.create(**defaults)
+    else:
+        job, created = Job.objects.get_or_create(
+            idempotency_key=idempotency_key, defaults=defaults
+        )
+        if not created and job.status == Job.FAILED:
+            Job.objects.filter(pk=job.pk, status=Job.FAILED).update(
+                status=Job.PENDING, attempts=0, error="",
+                run_after=timezone.now(),
+            )
+            job.refresh_from_db()
+    if settings.TASKS_EAGER and claim_job(job.pk):
+        run_job(job.pk)
+        job.refresh_from_db()
+    return job
+
+
+def claimable(now):
+    """
+    Задачи, готовые к запуску, и задачи с истёкшей блокировкой, у которых
+    остались попытки.
+    """
+    return Q(status=Job.PENDING, run_after__lte=now) | Q(
+        status=Job.RUNNING,
+        locked_until__lt=now,
+        attempts__lt=F("max_attempts"),
+    )
+
+
+def fail_abandoned(now):
+    """
+    Задачи, чей воркер погиб (OOM, SIGKILL) на последней попытке,
+    помечаются упавшими, а не висят в статусе RUNNING.
+    """
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_until__lt=now,
+        attempts__gte=F("max_attempts"),
+    ).update(
+        status=Job.FAILED,
+        error="Воркер завершился, не закончив задачу.",
+        finished_at=now,
+        locked_until=None,
+    )
+
+
+def claim_job(pk):
+    """
+    Захватывает задачу условным UPDATE: из нескольких воркеров задачу
+    получит только один, блокировки строк не нужны.
+    """
+    now = timezone.now()
+    return bool(Job.objects.filter(claimable(now), pk=pk).update(
+        status=Job.RUNNING,
+        attempts=F("attempts") + 1,
+        locked_until=now + timedelta(seconds=settings.TASKS_LOCK_TIMEOUT),
+    ))
+
+
+def claim(limit):
+    now = timezone.now()
+    fail_abandoned(now)
+    claimed = []
+    candidates = Job.objects.filter(
+        claimable(now)
+    ).order_by("run_after").values_list("pk", flat=True)[:limit * 2]
+    for pk in candidates:
+        if len(claimed) == limit:
+            break
+        if claim_job(pk):
+            claimed.append(pk)
+    return claimed
+
+
+def run_job(pk):
+    """Выполняет захваченную задачу и сохраняет результат или ошибку."""
+    job = Job.objects.get(pk=pk)
+    try:
+        func, _ = TASKS[job.name]
+    except KeyError:
+        func = None
+    try:
+        if func is None:
+            raise LookupError(f"Задача {job.name} не зарегистрирована")
+        result = func(**job.kwargs)
+    except Exception:
+        job.error = traceback.format_exc()
+        if func is not None and job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.TASKS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        logger.warning(
+            "Задача %s #%s упала (попытка %s из %s)",
+            job.name, job.pk, job.attempts, job.max_attempts,
+        )
+    else:
+        if isinstance(result, ContentFile):
+            job.artifact.save(result.name, result, save=False)
+        else:
+            job.result = result
+        job.status = Job.DONE
+        job.error = ""
+        job.finished_at = timezone.now()
+    job.locked_until = None
+    job.save()
+    return job.status
+
+
+def prune(older_than, batch_size=1000):
+    """
+    Удаляет завершённые и упавшие задачи, закончившиеся раньше
+    older_than, вместе с файлами результатов. Возвращает число задач.
+    """
+    finished = Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED), finished_at__lt=older_than
+    )
+    pruned = 0
+    while True:
+        jobs = list(finished.only("pk", "artifact")[:batch_size])
+        if not jobs:
+            return pruned
+        for job in jobs:
+            if job.artifact:
+                job.artifact.delete(save=False)
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+        pruned += len(jobs)
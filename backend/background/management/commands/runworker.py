@@ -0,0 +1,88 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from background.jobs import claim, prune, run_job
+
+logger = logging.getLogger(__name__)
+
+
+def reset_metrics_dir():
+    """
+    Каталог метрик prometheus_client для процессов пула: файлы прошлого
+    запуска удаляются, как делает gunicorn в on_starting.
+    """
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+class Command(BaseCommand):
+    help = (
+        "Воркер фоновых задач: забирает задачи из таблицы Job и выполняет "
+        "их в пуле процессов. Внешний брокер не нужен"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int,
+                            default=os.cpu_count() or 1)
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Пауза между опросами очереди, с")
+        parser.add_argument("--once", action="store_true",
+                            help="Выполнить очередь и завершиться")
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        connections.close_all()
+        reset_metrics_dir()
+        self.stdout.write(f"Воркер запущен, процессов: {processes}")
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        ) as pool:
+            running = set()
+            next_prune = 0
+            while True:
+                if time.monotonic() >= next_prune:
+                    self.prune()
+                    next_prune = (
+                        time.monotonic() + settings.TASKS_PRUNE_INTERVAL
+                    )
+                free = processes - len(running)
+                claimed = claim(free) if free else []
+                running.update(pool.submit(run_job, pk) for pk in claimed)
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+                done, running = wait(
+                    running,
+                    timeout=options["poll_interval"],
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    if future.exception() is not None:
+                        logger.error(
+                            "Процесс воркера завершился с ошибкой",
+                            exc_info=future.exception(),
+                        )
+
+    def prune(self):
+        pruned = prune(
+            timezone.now() - timedelta(days=settings.TASKS_RETENTION_DAYS)
+        )
+        if pruned:
+            logger.info("Удалено старых задач: %s", pruned)
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db import models
+
+
+class Job(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Готово"),
+        (FAILED, "Ошибка"),
+    )
+
+    name = models.CharField(max_length=100, verbose_name="Задача")
+    kwargs = models.JSONField(default=dict, verbose_name="Параметры")
+    idempotency_key = models.CharField(
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name="Ключ идемпотентности",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs",
+        verbose_name="Пользователь",
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=PENDING,
+        verbose_name="Статус",
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Попыток"
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=3, verbose_name="Максимум попыток"
+    )
+    run_after = models.DateTimeField(verbose_name="Не раньше")
+    locked_until = models.DateTimeField(
+        null=True, blank=True, verbose_name="Занята до"
+    )
+    result = models.JSONField(null=True, blank=True, verbose_name="Результат")
+    artifact = models.FileField(
+        upload_to="jobs/", blank=True, verbose_name="Файл результата"
+    )
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Создана"
+    )
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Завершена"
+    )
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            models.Index(
+                fields=["status", "run_after"], name="background_job_queue_idx"
+            ),
+        ]
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.utils import discard_shopping_cart_pdfs
+from .models import ArchivedShoppingListRecipe, ShoppingListRecipe
+
+
+def stale_cart_users(cutoff):
+    return ShoppingListRecipe.objects.values("user_id").annotate(
+        last_change=Max("created_at")
+    ).filter(last_change__lt=cutoff).values("user_id")
+
+
+def archive_stale_carts(days, batch_size):
+    """
+    Переносит в архив корзины, в которые ничего не добавляли days дней.
+    Пачка пользователей переносится в одной транзакции; корзины,
+    изменённые во время переноса, остаются на месте.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    user_ids = list(
+        stale_cart_users(cutoff).values_list("user_id", flat=True)
+    )
+    archived = 0
+    for start in range(0, len(user_ids), batch_size):
+        with transaction.atomic():
+            rows = list(
+                ShoppingListRecipe.objects.select_for_update()
+                .filter(user_id__in=stale_cart_users(cutoff).filter(
+                    user_id__in=user_ids[start:start + batch_size]
+                ))
+                .values_list("pk", "user_id", "recipe_id", "created_at")
+            )
+            ArchivedShoppingListRecipe.objects.bulk_create(
+                [
+                    ArchivedShoppingListRecipe(
+                        user_id=user_id,
+                        recipe_id=recipe_id,
+                        created_at=created_at,
+                    )
+                    for _, user_id, recipe_id, created_at in rows
+                ],
+                batch_size=batch_size,
+            )
+            ShoppingListRecipe.objects.filter(
+                pk__in=[row[0] for row in rows]
+            ).delete()
+            archived_users = {row[1] for row in rows}
+            transaction.on_commit(
+                lambda: discard_shopping_cart_pdfs(archived_users)
+            )
+        archived += len(rows)
+    return len(user_ids), archived
+
+
+@transaction.atomic
+def restore_cart(user_id):
+    """Возвращает архивную корзину пользователя."""
+    rows = ArchivedShoppingListRecipe.objects.filter(user_id=user_id)
+    ShoppingListRecipe.objects.bulk_create(
+        [
+            ShoppingListRecipe(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in rows.values_list("recipe_id", flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    restored, _ = rows.delete()
+    if restored:
+        transaction.on_commit(lambda: discard_shopping_cart_pdfs([user_id]))
+    return restored
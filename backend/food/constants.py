@@ -8,3 +8,32 @@ MIN_AMOUNT_INGREDIENT = 1
 MAX_AMOUNT_INGREDIENT = 32767
 MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 32767
+SEARCH_CONFIG = "russian"
+INGREDIENT_INDEX_SYNC_OVERLAP = 60
+INGREDIENT_INDEX_SYNC_INTERVAL = 5
+INGREDIENT_INDEX_MAX_OVERRIDES = 10000
+INGREDIENT_CATALOG_TTL = 300
+INGREDIENT_CATALOG_REFRESH_INTERVAL = 10
+WHAT_CAN_I_COOK_LIMIT = 20
+WHAT_CAN_I_COOK_MAX_LIMIT = 100
+RECOMMENDATIONS_TOP_K = 50
+RECOMMENDATIONS_CART_WEIGHT = 0.5
+RECOMMENDATIONS_LIMIT = 20
+RECOMMENDATIONS_MAX_LIMIT = 100
+POPULARITY_WEIGHTS = {
+    "favorite": 1.0,
+    "cart": 0.5,
+    "link_hit": 0.1,
+}
+TRENDING_HALF_LIFE_DAYS = 3
+TRENDING_WINDOW_DAYS = 30
+RANKING_FIELDS = {
+    "popular": "popularity",
+    "trending": "trending",
+}
+TIMELINE_SIZE = 500
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_TRIM_BATCH_SIZE = 1000
+BATCH_RECIPES_MAX = 100
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_SIZE = 65536
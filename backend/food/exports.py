@@ -0,0 +1,156 @@
+import csv
+import json
+import zlib
+from collections import defaultdict
+from itertools import islice
+
+from .constants import EXPORT_BUFFER_SIZE, EXPORT_CHUNK_SIZE
+from .ingredient_catalog import ingredient_catalog
+from .models import IngredientInRecipe, Ingredients, Recipe
+
+RECIPE_EXPORT_FIELDS = (
+    "id", "name", "text", "cooking_time", "author", "pub_date", "image",
+    "tags", "ingredients",
+)
+INGREDIENT_EXPORT_FIELDS = ("id", "name", "measurement_unit")
+
+
+def recipe_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Рецепты с тегами и ингредиентами. Рецепты читаются серверным курсором,
+    теги и ингредиенты догружаются двумя запросами на каждую пачку из
+    chunk_size рецептов. Модели не создаются: на больших выгрузках
+    это основная часть времени.
+    """
+    recipes = queryset.order_by("pk").values_list(
+        "id", "name", "text", "cooking_time", "author__username",
+        "pub_date", "image",
+    ).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(recipes, chunk_size)):
+        ids = [row[0] for row in chunk]
+        tags = defaultdict(list)
+        for recipe_id, slug in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids
+        ).order_by("pk").values_list("recipe_id", "tags__slug"):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id, amount in (
+            IngredientInRecipe.objects.filter(recipe_id__in=ids)
+            .order_by("pk").values_list("recipe_id", "ingredient_id", "amount")
+        ):
+            ingredient = ingredient_catalog.get(ingredient_id, refresh=True)
+            if ingredient is None:
+                continue
+            ingredients[recipe_id].append({
+                "name": ingredient.name,
+                "measurement_unit": ingredient.measurement_unit,
+                "amount": amount,
+            })
+        for pk, name, text, cooking_time, author, pub_date, image in chunk:
+            yield {
+                "id": pk,
+                "name": name,
+                "text": text,
+                "cooking_time": cooking_time,
+                "author": author,
+                "pub_date": pub_date.isoformat(),
+                "image": image,
+                "tags": tags[pk],
+                "ingredients": ingredients[pk],
+            }
+
+
+def ingredient_rows(chunk_size=EXPORT_CHUNK_SIZE):
+    return Ingredients.objects.order_by("pk").values(
+        *INGREDIENT_EXPORT_FIELDS
+    ).iterator(chunk_size=chunk_size)
+
+
+EXPORTS = {
+    "recipes": (
+        RECIPE_EXPORT_FIELDS,
+        lambda user: recipe_rows(Recipe.objects.all()),
+    ),
+    "ingredients": (
+        INGREDIENT_EXPORT_FIELDS,
+        lambda user: ingredient_rows(),
+    ),
+    "my_recipes": (
+        RECIPE_EXPORT_FIELDS,
+        lambda user: recipe_rows(Recipe.objects.filter(author_id=user.pk)),
+    ),
+    "favorites": (
+        RECIPE_EXPORT_FIELDS,
+        lambda user: recipe_rows(
+            Recipe.objects.filter(favorited_by__user_id=user.pk)
+        ),
+    ),
+    "shopping_cart": (
+        RECIPE_EXPORT_FIELDS,
+        lambda user: recipe_rows(
+            Recipe.objects.filter(shopping_cart_by__user_id=user.pk)
+        ),
+    ),
+}
+PUBLIC_EXPORTS = ("recipes", "ingredients")
+
+
+def ndjson_lines(rows, fields):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, fields):
+    """Вложенные списки записываются в ячейку как JSON."""
+    writer = csv.DictWriter(Echo(), fields)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow({
+            name: (
+                json.dumps(value, ensure_ascii=False)
+                if isinstance(value, list) else value
+            )
+            for name, value in row.items()
+        })
+
+
+FORMATS = {
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+    "csv": (csv_lines, "text/csv"),
+}
+
+
+def buffered(lines, size=EXPORT_BUFFER_SIZE):
+    """Склеивает строки в блоки около size байт."""
+    chunk, length = [], 0
+    for line in lines:
+        data = line.encode()
+        chunk.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(name, output_format, user=None, compress=False):
+    """Блоки байт выгрузки name в формате ndjson или csv."""
+    fields, rows = EXPORTS[name]
+    write_lines, _ = FORMATS[output_format]
+    chunks = buffered(write_lines(rows(user), fields))
+    return gzipped(chunks) if compress else chunks
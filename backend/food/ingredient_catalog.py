@@ -0,0 +1,106 @@
+import sys
+import time
+from threading import Lock
+
+from foodgram import metrics
+from .constants import (INGREDIENT_CATALOG_REFRESH_INTERVAL,
+                        INGREDIENT_CATALOG_TTL)
+from .models import Ingredients
+
+
+class IngredientRecord:
+    __slots__ = ("id", "name", "measurement_unit")
+
+    def __init__(self, pk, name, measurement_unit):
+        self.id = pk
+        self.name = name
+        self.measurement_unit = measurement_unit
+
+
+class CatalogSnapshot:
+    """
+    Неизменяемый срез справочника: записи по id в словаре records и
+    обратный словарь (название, единица) -> id. Строки интернированы,
+    единицы измерения у тысяч ингредиентов делят несколько объектов.
+    """
+
+    __slots__ = ("records", "by_name", "built_at")
+
+    def __init__(self, rows):
+        self.records = {
+            pk: IngredientRecord(pk, sys.intern(name), sys.intern(unit))
+            for pk, name, unit in rows
+        }
+        self.by_name = {
+            (record.name, record.measurement_unit): record.id
+            for record in self.records.values()
+        }
+        self.built_at = time.monotonic()
+
+    def get(self, ingredient_id):
+        return self.records.get(ingredient_id)
+
+
+class IngredientCatalog:
+    """
+    Справочник ингредиентов в памяти процесса. Срез строится одним
+    запросом при первом обращении и заменяется целиком: после изменения
+    ингредиента в этом процессе (сигналы) и не реже раза в
+    INGREDIENT_CATALOG_TTL секунд для изменений из других процессов.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._snapshot = None
+
+    @property
+    def snapshot(self):
+        snapshot = self._snapshot
+        fresh = (
+            snapshot is not None
+            and time.monotonic() - snapshot.built_at <= INGREDIENT_CATALOG_TTL
+        )
+        if not fresh:
+            with self._lock:
+                if self._snapshot is snapshot:
+                    self._snapshot = CatalogSnapshot(
+                        Ingredients.objects.order_by("pk").values_list(
+                            "id", "name", "measurement_unit"
+                        )
+                    )
+                    metrics.CACHE_REBUILDS.labels("ingredient_catalog").inc()
+                snapshot = self._snapshot
+        return snapshot
+
+    def get(self, ingredient_id, refresh=False):
+        """
+        Запись по id или None. С refresh=True промах перестраивает срез:
+        так читаются id из базы, которые могли появиться позже среза.
+        Срез моложе INGREDIENT_CATALOG_REFRESH_INTERVAL секунд не
+        перестраивается, запись читается из базы отдельно, чтобы поток
+        промахов не перестраивал справочник на каждом запросе. None
+        значит, что ингредиента нет и в базе.
+        """
+        snapshot = self.snapshot
+        record = snapshot.get(ingredient_id)
+        if record is not None or not refresh:
+            return record
+        age = time.monotonic() - snapshot.built_at
+        if age < INGREDIENT_CATALOG_REFRESH_INTERVAL:
+            row = Ingredients.objects.filter(pk=ingredient_id).values_list(
+                "id", "name", "measurement_unit"
+            ).first()
+            return IngredientRecord(*row) if row else None
+        with self._lock:
+            if self._snapshot is snapshot:
+                self._snapshot = None
+        return self.snapshot.get(ingredient_id)
+
+    def lookup(self, name, measurement_unit):
+        return self.snapshot.by_name.get((name, measurement_unit))
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+ingredient_catalog = IngredientCatalog()
@@ -0,0 +1,173 @@
+import time
+from datetime import timedelta
+from itertools import chain
+from threading import Lock
+
+import numpy as np
+from django.utils import timezone
+
+from foodgram import metrics
+from .constants import (INGREDIENT_INDEX_MAX_OVERRIDES,
+                        INGREDIENT_INDEX_SYNC_INTERVAL,
+                        INGREDIENT_INDEX_SYNC_OVERLAP)
+from .models import IngredientInRecipe, Recipe
+
+EMPTY = np.empty(0, dtype=np.int32)
+
+
+class RecipeMatch:
+    __slots__ = ("recipe_id", "coverage", "missing")
+
+    def __init__(self, recipe_id, coverage, missing):
+        self.recipe_id = recipe_id
+        self.coverage = coverage
+        self.missing = missing
+
+
+class IngredientIndex:
+    """
+    Инвертированный индекс ингредиент -> рецепты в памяти процесса.
+
+    Основа хранится в формате CSR: отсортированные id рецептов по каждому
+    ингредиенту подряд в postings и границы в offsets. Рецепты, изменённые
+    после построения, лежат в overrides (id рецепта -> его ингредиенты) и
+    перекрывают основу, пока их не станет больше
+    INGREDIENT_INDEX_MAX_OVERRIDES, после чего индекс строится заново.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._built = False
+        self.synced_at = None
+        self.checked_at = None
+        self.set_pairs(EMPTY, EMPTY)
+
+    def set_pairs(self, ingredient_ids, recipe_ids):
+        ingredient_ids = np.asarray(ingredient_ids, dtype=np.int32)
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int32)
+        order = np.lexsort((recipe_ids, ingredient_ids))
+        offsets = np.searchsorted(
+            ingredient_ids[order],
+            np.arange(int(ingredient_ids.max(initial=0)) + 2),
+        )
+        sizes = np.bincount(recipe_ids).astype(np.int32)
+        self.base = (recipe_ids[order], offsets, sizes)
+        self.overrides = {}
+
+    def build(self):
+        synced_at = timezone.now()
+        pairs = np.fromiter(
+            chain.from_iterable(
+                IngredientInRecipe.objects.order_by()
+                .values_list("ingredient_id", "recipe_id")
+                .iterator(chunk_size=20000)
+            ),
+            dtype=np.int32,
+        ).reshape(-1, 2)
+        self.set_pairs(pairs[:, 0], pairs[:, 1])
+        self.synced_at = synced_at
+        self.checked_at = time.monotonic()
+        self._built = True
+        metrics.CACHE_REBUILDS.labels("ingredient_index").inc()
+
+    def sync(self):
+        """
+        Подтягивает рецепты, изменённые после прошлой синхронизации.
+        Окно перекрытия INGREDIENT_INDEX_SYNC_OVERLAP покрывает транзакции,
+        которые зафиксировались позже своего updated_at. Чаще раза в
+        INGREDIENT_INDEX_SYNC_INTERVAL секунд база не опрашивается.
+        """
+        if self.is_recent():
+            return
+        with self._lock:
+            if self.is_recent():
+                return
+            if not self._built:
+                self.build()
+                return
+            synced_at = timezone.now()
+            changed = list(Recipe.objects.filter(
+                updated_at__gt=self.synced_at - timedelta(
+                    seconds=INGREDIENT_INDEX_SYNC_OVERLAP
+                )
+            ).values_list("pk", flat=True))
+            overrides = dict(self.overrides)
+            for recipe_id in changed:
+                overrides[recipe_id] = frozenset()
+            for recipe_id, ingredient_id in (
+                IngredientInRecipe.objects.filter(recipe_id__in=changed)
+                .values_list("recipe_id", "ingredient_id")
+            ):
+                overrides[recipe_id] |= {ingredient_id}
+            if len(overrides) > INGREDIENT_INDEX_MAX_OVERRIDES:
+                self.build()
+                return
+            self.overrides = overrides
+            self.synced_at = synced_at
+            self.checked_at = time.monotonic()
+
+    def is_recent(self):
+        checked_at = self.checked_at
+        return checked_at is not None and (
+            time.monotonic() - checked_at < INGREDIENT_INDEX_SYNC_INTERVAL
+        )
+
+    def discard(self, recipe_id):
+        with self._lock:
+            self.overrides = {**self.overrides, recipe_id: frozenset()}
+
+    def match(self, ingredient_ids, limit):
+        """
+        Рецепты, упорядоченные по доле ингредиентов рецепта, которые есть
+        в ingredient_ids, затем по числу недостающих и новизне.
+        """
+        ingredient_ids = set(ingredient_ids)
+        postings, offsets, sizes = self.base
+        overrides = self.overrides
+        base = [
+            postings[offsets[ingredient_id]:offsets[ingredient_id + 1]]
+            for ingredient_id in ingredient_ids
+            if 0 <= ingredient_id < len(offsets) - 1
+        ]
+        counts = np.bincount(
+            np.concatenate(base) if base else EMPTY,
+            minlength=len(sizes),
+        )
+        if overrides:
+            stale = np.fromiter(overrides, dtype=np.int64)
+            counts[stale[stale < len(counts)]] = 0
+        candidates = np.flatnonzero(counts)
+        matched = counts[candidates]
+        sizes = sizes[candidates]
+        extra = [
+            (recipe_id, len(ingredients & ingredient_ids), len(ingredients))
+            for recipe_id, ingredients in overrides.items()
+            if ingredients & ingredient_ids
+        ]
+        if extra:
+            extra_ids, extra_matched, extra_sizes = zip(*extra)
+            candidates = np.concatenate((candidates, extra_ids))
+            matched = np.concatenate((matched, extra_matched))
+            sizes = np.concatenate((sizes, extra_sizes))
+        coverage = matched / np.maximum(sizes, 1)
+        missing = sizes - matched
+        if len(candidates) > limit:
+            cutoff = np.partition(coverage, len(coverage) - limit)[
+                len(coverage) - limit
+            ]
+            keep = coverage >= cutoff
+            candidates = candidates[keep]
+            coverage = coverage[keep]
+            missing = missing[keep]
+        order = np.lexsort((-candidates, missing, -coverage))[:limit]
+        return [
+            RecipeMatch(
+                int(candidates[position]),
+                float(coverage[position]),
+                int(missing[position]),
+            )
+            for position in order
+        ]
+
+
+ingredient_index = IngredientIndex()
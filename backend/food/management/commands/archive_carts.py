@@ -0,0 +1,42 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from food.archive import archive_stale_carts, restore_cart
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Перенос корзин, в которые давно ничего не добавляли, в архивную "
+        "таблицу. С --restore возвращает корзину пользователя"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--restore", metavar="USERNAME")
+
+    def handle(self, *args, **options):
+        if options["restore"]:
+            try:
+                user = User.objects.get(username=options["restore"])
+            except User.DoesNotExist:
+                raise CommandError(
+                    f"Пользователь {options['restore']} не найден"
+                )
+            restored = restore_cart(user.pk)
+            self.stdout.write(self.style.SUCCESS(
+                f"Возвращено рецептов в корзину: {restored}"
+            ))
+            return
+        start = time.perf_counter()
+        users, archived = archive_stale_carts(
+            options["days"], options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"В архив перенесено {archived} рецептов из {users} корзин "
+            f"за {time.perf_counter() - start:.1f} с"
+        ))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from food.constants import RECOMMENDATIONS_CART_WEIGHT, RECOMMENDATIONS_TOP_K
+from food.recommendations import build_similarities
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчёт похожих рецептов по совместному добавлению в избранное "
+        "и корзину. Запускается периодически, например из cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int,
+                            default=RECOMMENDATIONS_TOP_K,
+                            help="Соседей на рецепт")
+        parser.add_argument("--cart-weight", type=float,
+                            default=RECOMMENDATIONS_CART_WEIGHT,
+                            help="Вес корзины относительно избранного")
+        parser.add_argument("--block-size", type=int, default=2000,
+                            help="Строк матрицы за один шаг")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        created = build_similarities(
+            options["top_k"],
+            options["cart_weight"],
+            options["block_size"],
+            options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Сохранено {created} пар похожих рецептов "
+            f"за {time.perf_counter() - start:.1f} с"
+        ))
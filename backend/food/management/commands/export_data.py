@@ -0,0 +1,57 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from food.exports import EXPORTS, FORMATS, PUBLIC_EXPORTS, export_chunks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоковая выгрузка рецептов, ингредиентов или данных пользователя "
+        "в NDJSON или CSV с постоянным расходом памяти"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", choices=sorted(EXPORTS))
+        parser.add_argument("--format", choices=sorted(FORMATS),
+                            default="ndjson")
+        parser.add_argument("--output", help="Файл, по умолчанию stdout")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--user", help="username для данных "
+                                           "пользователя")
+
+    def handle(self, *args, **options):
+        name = options["name"]
+        user = None
+        if name not in PUBLIC_EXPORTS:
+            if not options["user"]:
+                raise CommandError(f"Для выгрузки {name} нужен --user")
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(
+                    f"Пользователь {options['user']} не найден"
+                )
+        output = (
+            open(options["output"], "wb") if options["output"]
+            else sys.stdout.buffer
+        )
+        start = time.perf_counter()
+        size = 0
+        try:
+            for chunk in export_chunks(
+                name, options["format"], user, options["gzip"]
+            ):
+                output.write(chunk)
+                size += len(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(
+            f"Выгружено {size / 2 ** 20:.1f} МБ "
+            f"за {time.perf_counter() - start:.1f} с"
+        ))
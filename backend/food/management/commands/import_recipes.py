@@ -0,0 +1,256 @@
+import csv
+import gzip
+import json
+import os
+import random
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from food.constants import (MAX_AMOUNT_INGREDIENT, MAX_COOKING_TIME,
+                            MIN_AMOUNT_INGREDIENT, MIN_COOKING_TIME,
+                            RECIPE_NAME_MAX_LENGTH,
+                            SHORT_CODE_URLS_MAX_LENGTH)
+from food.ingredient_catalog import ingredient_catalog
+from food.models import IngredientInRecipe, Recipe, Tags
+
+User = get_user_model()
+
+JSON_COLUMNS = ("tags", "ingredients")
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Импорт рецептов из NDJSON или CSV в формате export_data. "
+        "Ингредиенты ищутся по названию и единице измерения, теги по slug, "
+        "картинки копируются из --images-dir. Прогресс сохраняется после "
+        "каждой пачки, --resume продолжает прерванный импорт"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=("ndjson", "csv"),
+                            help="По умолчанию по расширению файла")
+        parser.add_argument("--images-dir",
+                            help="Каталог с картинками. Без него поле image "
+                                 "считается именем файла в хранилище")
+        parser.add_argument("--author",
+                            help="username автора для строк без автора")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=8,
+                            help="Потоков для копирования картинок")
+        parser.add_argument("--resume", action="store_true")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        input_format = options["format"] or (
+            "csv" if path.removesuffix(".gz").endswith(".csv") else "ndjson"
+        )
+        self.images_dir = options["images_dir"]
+        self.default_author = options["author"]
+        self.tags = dict(Tags.objects.values_list("slug", "id"))
+        self.authors = {}
+        self.used_codes = set(
+            Recipe.objects.exclude(short_code=None)
+            .values_list("short_code", flat=True)
+        )
+        checkpoint = Path(f"{path}.progress")
+        done = 0
+        if options["resume"] and checkpoint.exists():
+            done = json.loads(checkpoint.read_text())["rows"]
+            self.stdout.write(f"Продолжение со строки {done + 1}")
+        rows = islice(self.read_rows(path, input_format), done, None)
+        created = skipped = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options["threads"]) as pool:
+            while batch := list(islice(rows, options["batch_size"])):
+                try:
+                    count = self.import_batch(batch, pool)
+                except Exception as error:
+                    raise CommandError(
+                        f"Пачка со строки {batch[0][0]} не записана: "
+                        f"{error}. Импорт можно продолжить с --resume"
+                    ) from error
+                done += len(batch)
+                created += count
+                skipped += len(batch) - count
+                checkpoint.write_text(json.dumps({"rows": done}))
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"Строк: {done}, создано {created}, пропущено "
+                    f"{skipped}, {created / elapsed:.0f} рецептов/с"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"Импортировано {created} рецептов за "
+            f"{time.perf_counter() - start:.1f} с"
+        ))
+
+    def read_rows(self, path, input_format):
+        """Пары (номер строки данных, строка NDJSON или словарь CSV)."""
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", newline="") as file:
+            if input_format == "csv":
+                yield from enumerate(csv.DictReader(file), 1)
+            else:
+                yield from enumerate(file, 1)
+
+    def parse(self, raw):
+        try:
+            if isinstance(raw, str):
+                row = json.loads(raw)
+            else:
+                row = {
+                    name: json.loads(value) if name in JSON_COLUMNS else value
+                    for name, value in raw.items()
+                }
+        except json.JSONDecodeError as error:
+            raise RowError(f"некорректный JSON: {error}")
+        if not isinstance(row, dict):
+            raise RowError("ожидается объект")
+        return row
+
+    def author_of(self, row):
+        return str(row.get("author") or self.default_author)
+
+    def load_authors(self, usernames):
+        missing = set(usernames) - self.authors.keys()
+        if missing:
+            self.authors.update(
+                User.objects.filter(username__in=missing)
+                .values_list("username", "id")
+            )
+
+    def resolve(self, row):
+        """Проверяет строку и заменяет имена на id."""
+        author = self.author_of(row)
+        if author not in self.authors:
+            raise RowError(f"автор {author} не найден")
+        name = str(row.get("name") or "").strip()
+        if not name or len(name) > RECIPE_NAME_MAX_LENGTH:
+            raise RowError("пустое или слишком длинное название")
+        try:
+            cooking_time = int(row.get("cooking_time"))
+        except (TypeError, ValueError):
+            raise RowError("время приготовления не число")
+        if not MIN_COOKING_TIME <= cooking_time <= MAX_COOKING_TIME:
+            raise RowError("время приготовления вне допустимых границ")
+        ingredients = {}
+        for item in row.get("ingredients") or ():
+            key = (
+                str(item.get("name", "")).lower().strip(),
+                str(item.get("measurement_unit", "")).strip(),
+            )
+            ingredient_id = ingredient_catalog.lookup(*key)
+            if ingredient_id is None:
+                raise RowError(f"ингредиент {key[0]} ({key[1]}) не найден")
+            amount = int(item.get("amount", 0))
+            if not MIN_AMOUNT_INGREDIENT <= amount <= MAX_AMOUNT_INGREDIENT:
+                raise RowError(f"неверное количество ингредиента {key[0]}")
+            ingredients[ingredient_id] = amount
+        if not ingredients:
+            raise RowError("нет ингредиентов")
+        tags = set()
+        for slug in row.get("tags") or ():
+            if slug not in self.tags:
+                raise RowError(f"тег {slug} не найден")
+            tags.add(self.tags[slug])
+        if not row.get("image"):
+            raise RowError("нет картинки")
+        return {
+            "recipe": Recipe(
+                author_id=self.authors[author],
+                name=name,
+                text=str(row.get("text") or ""),
+                cooking_time=cooking_time,
+                short_code=self.short_code(),
+            ),
+            "image": row["image"],
+            "ingredients": ingredients,
+            "tags": tags,
+        }
+
+    def short_code(self):
+        chars = string.ascii_letters + string.digits
+        while True:
+            code = "".join(random.choices(chars, k=SHORT_CODE_URLS_MAX_LENGTH))
+            if code not in self.used_codes:
+                self.used_codes.add(code)
+                return code
+
+    def copy_image(self, name):
+        if self.images_dir is None:
+            return name
+        source = Path(self.images_dir) / name
+        with open(source, "rb") as file:
+            return default_storage.save(
+                f"recipe/{os.path.basename(name)}", File(file)
+            )
+
+    def import_batch(self, batch, pool):
+        """Записывает пачку в одной транзакции, возвращает число рецептов."""
+        items, parsed = [], []
+        for number, raw in batch:
+            try:
+                parsed.append((number, self.parse(raw)))
+            except RowError as error:
+                self.stderr.write(f"Строка {number}: {error}")
+        self.load_authors(self.author_of(row) for _, row in parsed)
+        for number, row in parsed:
+            try:
+                items.append((number, self.resolve(row)))
+            except (RowError, AttributeError, TypeError, ValueError) as error:
+                self.stderr.write(f"Строка {number}: {error}")
+        futures = [
+            pool.submit(self.copy_image, item["image"]) for _, item in items
+        ]
+        copied, ready = [], []
+        for (number, item), future in zip(items, futures):
+            if future.exception() is not None:
+                self.stderr.write(
+                    f"Строка {number}: картинка: {future.exception()}"
+                )
+                continue
+            image = future.result()
+            item["recipe"].image = image
+            ready.append(item)
+            if self.images_dir is not None:
+                copied.append(image)
+        try:
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create(
+                    [item["recipe"] for item in ready]
+                )
+                IngredientInRecipe.objects.bulk_create([
+                    IngredientInRecipe(
+                        recipe_id=recipe.pk,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for recipe, item in zip(recipes, ready)
+                    for ingredient_id, amount in item["ingredients"].items()
+                ])
+                Recipe.tags.through.objects.bulk_create([
+                    Recipe.tags.through(recipe_id=recipe.pk, tags_id=tag_id)
+                    for recipe, item in zip(recipes, ready)
+                    for tag_id in item["tags"]
+                ])
+                Recipe.objects.filter(
+                    pk__in=[recipe.pk for recipe in recipes]
+                ).update_search_vector()
+        except Exception:
+            for name in copied:
+                default_storage.delete(name)
+            raise
+        return len(recipes)
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from food.partitioning import (RELATION_TABLES, partition_table,
+                               unpartition_table)
+
+
+class Command(BaseCommand):
+    help = (
+        "Секционирование избранного, корзин и подписок по хешу user_id "
+        "в PostgreSQL. Таблица блокируется на время переноса. "
+        "С --reverse возвращает обычные таблицы"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--partitions", type=int, default=16)
+        parser.add_argument(
+            "--table", action="append", choices=RELATION_TABLES,
+            help="По умолчанию все таблицы связей",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--reverse", action="store_true")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "postgresql":
+            raise CommandError("Секционирование доступно только в PostgreSQL")
+        for table in options["table"] or RELATION_TABLES:
+            start = time.perf_counter()
+            if options["reverse"]:
+                moved = unpartition_table(connection, table)
+                if moved is None:
+                    self.stdout.write(f"{table} не секционирована")
+                    continue
+                self.stdout.write(self.style.SUCCESS(
+                    f"{table}: {moved} строк в обычной таблице "
+                    f"за {time.perf_counter() - start:.1f} с"
+                ))
+                continue
+            moved = partition_table(connection, table, options["partitions"])
+            if moved is None:
+                self.stdout.write(f"{table} уже секционирована")
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{table}: {moved} строк в {options['partitions']} секциях "
+                f"за {time.perf_counter() - start:.1f} с"
+            ))
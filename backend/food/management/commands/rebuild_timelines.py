@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from food import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересборка лент подписок из графа подписок. С --trim только "
+        "обрезает ленты до TIMELINE_SIZE записей"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trim", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options["trim"]:
+            deleted = timeline.trim(options["batch_size"])
+            message = f"Удалено {deleted} устаревших записей лент"
+        else:
+            created = timeline.rebuild(options["batch_size"])
+            message = f"Создано {created} записей лент"
+        self.stdout.write(self.style.SUCCESS(
+            f"{message} за {time.perf_counter() - start:.1f} с"
+        ))
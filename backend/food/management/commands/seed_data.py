@@ -0,0 +1,263 @@
+import io
+import json
+import random
+import string
+import time
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from food.constants import SHORT_CODE_URLS_MAX_LENGTH
+from food.models import (FavoriteRecipe, IngredientInRecipe, Ingredients,
+                         Recipe, ShoppingListRecipe, Tags)
+from users.models import Follow
+
+User = get_user_model()
+
+SEED_TAGS = (
+    ("Завтрак", "breakfast"),
+    ("Обед", "lunch"),
+    ("Ужин", "dinner"),
+    ("Десерт", "dessert"),
+    ("Выпечка", "bakery"),
+    ("Суп", "soup"),
+)
+SEED_PASSWORD = "foodgram-seed"
+SEED_IMAGE_NAME = "recipe/seed.png"
+WORDS = (
+    "домашний", "быстрый", "сытный", "лёгкий", "праздничный", "острый",
+    "сладкий", "овощной", "куриный", "рыбный", "деревенский", "летний",
+)
+DISHES = (
+    "суп", "салат", "пирог", "омлет", "рагу", "плов", "борщ", "кекс",
+    "соус", "гуляш", "запеканка", "паста",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполнение базы синтетическими данными для нагрузочного "
+        "тестирования: пользователи, рецепты, подписки, избранное, корзины"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--recipes", type=int, default=1000)
+        parser.add_argument("--follows", type=int, default=10,
+                            help="Подписок на пользователя")
+        parser.add_argument("--favorites", type=int, default=20,
+                            help="Рецептов в избранном у пользователя")
+        parser.add_argument("--carts", type=int, default=5,
+                            help="Рецептов в корзине у пользователя")
+        parser.add_argument("--skew", type=float, default=1.1,
+                            help="Показатель распределения Ципфа")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--ingredients-file",
+            default=settings.BASE_DIR.parent / "data" / "ingredients.json",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.skew = options["skew"]
+        self._cum_weights = {}
+        start = time.perf_counter()
+        with transaction.atomic():
+            ingredients = self.by_popularity(
+                self.seed_ingredients(options["ingredients_file"])
+            )
+            tags = self.seed_tags()
+            users = self.seed_users(options["users"])
+            recipes = self.seed_recipes(
+                options["recipes"], users, ingredients, tags
+            )
+            self.seed_follows(users, options["follows"])
+            self.seed_relations(
+                FavoriteRecipe, users, recipes, options["favorites"]
+            )
+            self.seed_relations(
+                ShoppingListRecipe, users, recipes, options["carts"]
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано {len(users)} пользователей и {len(recipes)} рецептов "
+            f"за {time.perf_counter() - start:.1f} с. "
+            f"Пароль пользователей: {SEED_PASSWORD}"
+        ))
+
+    def cum_weights(self, size):
+        if size not in self._cum_weights:
+            self._cum_weights[size] = list(accumulate(
+                1 / (rank ** self.skew) for rank in range(1, size + 1)
+            ))
+        return self._cum_weights[size]
+
+    def by_popularity(self, population):
+        ranked = list(population)
+        self.random.shuffle(ranked)
+        return ranked
+
+    def skewed_sample(self, ranked, k):
+        """k различных элементов, популярность убывает по закону Ципфа."""
+        if 2 * k >= len(ranked):
+            return self.random.sample(ranked, min(k, len(ranked)))
+        cum_weights = self.cum_weights(len(ranked))
+        chosen = set()
+        while len(chosen) < k:
+            chosen.update(
+                self.random.choices(
+                    ranked, cum_weights=cum_weights, k=k - len(chosen)
+                )
+            )
+        return list(chosen)
+
+    def seed_ingredients(self, file_path):
+        if not Ingredients.objects.exists():
+            with open(file_path, encoding="utf-8") as f:
+                data = json.load(f)
+            Ingredients.objects.bulk_create(
+                [
+                    Ingredients(
+                        name=item["name"].lower().strip(),
+                        measurement_unit=item["measurement_unit"].strip(),
+                    )
+                    for item in data
+                ],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+        return list(Ingredients.objects.values_list("id", flat=True))
+
+    def seed_tags(self):
+        return [
+            Tags.objects.get_or_create(name=name, slug=slug)[0].id
+            for name, slug in SEED_TAGS
+        ]
+
+    def seed_users(self, count):
+        password = make_password(SEED_PASSWORD)
+        offset = User.objects.count()
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f"seed{offset + i}@example.com",
+                    username=f"seed{offset + i}",
+                    first_name="Тест",
+                    last_name=f"Пользователь {offset + i}",
+                    password=password,
+                )
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        return self.by_popularity(user.id for user in users)
+
+    def seed_image(self):
+        if not default_storage.exists(SEED_IMAGE_NAME):
+            buffer = io.BytesIO()
+            Image.new("RGB", (400, 300), (230, 150, 80)).save(buffer, "PNG")
+            default_storage.save(
+                SEED_IMAGE_NAME, ContentFile(buffer.getvalue())
+            )
+        return SEED_IMAGE_NAME
+
+    def short_codes(self, count):
+        used = set(
+            Recipe.objects.exclude(short_code=None)
+            .values_list("short_code", flat=True)
+        )
+        chars = string.ascii_letters + string.digits
+        codes = []
+        while len(codes) < count:
+            code = "".join(
+                self.random.choices(chars, k=SHORT_CODE_URLS_MAX_LENGTH)
+            )
+            if code not in used:
+                used.add(code)
+                codes.append(code)
+        return codes
+
+    def seed_recipes(self, count, users, ingredients, tags):
+        image = self.seed_image()
+        authors = self.random.choices(
+            users, cum_weights=self.cum_weights(len(users)), k=count
+        )
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    author_id=author_id,
+                    name=(
+                        f"{self.random.choice(WORDS).capitalize()} "
+                        f"{self.random.choice(DISHES)} №{i}"
+                    ),
+                    text=" ".join(
+                        self.random.choices(WORDS + DISHES, k=60)
+                    ),
+                    image=image,
+                    cooking_time=self.random.randint(5, 180),
+                    short_code=short_code,
+                )
+                for i, (author_id, short_code) in enumerate(
+                    zip(authors, self.short_codes(count))
+                )
+            ],
+            batch_size=self.batch_size,
+        )
+        recipe_ids = self.by_popularity(recipe.id for recipe in recipes)
+        IngredientInRecipe.objects.bulk_create(
+            (
+                IngredientInRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 500),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in self.skewed_sample(
+                    ingredients, self.random.randint(3, 10)
+                )
+            ),
+            batch_size=self.batch_size,
+        )
+        RecipeTags = Recipe.tags.through
+        RecipeTags.objects.bulk_create(
+            (
+                RecipeTags(recipe_id=recipe_id, tags_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in self.random.sample(
+                    tags, self.random.randint(1, 3)
+                )
+            ),
+            batch_size=self.batch_size,
+        )
+        Recipe.objects.filter(search_vector=None).update_search_vector()
+        return recipe_ids
+
+    def seed_follows(self, users, per_user):
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, following_id=following_id)
+                for user_id in users
+                for following_id in self.skewed_sample(users, per_user + 1)
+                if following_id != user_id
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+
+    def seed_relations(self, model, users, recipes, per_user):
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in users
+                for recipe_id in self.skewed_sample(recipes, per_user)
+            ),
+            batch_size=self.batch_size,
+        )
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from food.rankings import update_rankings
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчёт популярности и трендов рецептов для ordering=popular "
+        "и ordering=trending. Запускается периодически, например из cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        changed = update_rankings(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Обновлены оценки {changed} рецептов "
+            f"за {time.perf_counter() - start:.1f} с"
+        ))
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:04
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="favoriterecipe",
+            name="recipe",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="favorited_by",
+                to="food.recipe",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="favoriterecipe",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="favorites",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="ingredients",
+            name="measurement_unit",
+            field=models.CharField(
+                max_length=64, verbose_name="Единица измерения"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="ingredients",
+            name="name",
+            field=models.CharField(max_length=128, verbose_name="Название"),
+        ),
+        migrations.AlterField(
+            model_name="recipe",
+            name="cooking_time",
+            field=models.PositiveSmallIntegerField(
+                help_text="Укажите время в минутах (минимум 1 минута)",
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(
+                        32767,
+                        message="Время приготовления не может превышать 1000 минут.",
+                    ),
+                ],
+                verbose_name="Время приготовления (минут)",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="shoppinglistrecipe",
+            name="recipe",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="shopping_cart_by",
+                to="food.recipe",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="shoppinglistrecipe",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="purchases",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food", "0005_recipe_search_vector"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Дата изменения"
+            ),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:14
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Время добавления существующих записей неизвестно. Эпоха не даёт
+# им попасть в «тренды» и не откладывает архивацию старых корзин.
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food", "0007_recipesimilarity"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeLinkHits",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "hits",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Переходов по короткой ссылке"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Переходы по короткой ссылке",
+                "verbose_name_plural": "Переходы по коротким ссылкам",
+            },
+        ),
+        migrations.AddField(
+            model_name="favoriterecipe",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=EPOCH,
+                verbose_name="Дата добавления",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="popularity",
+            field=models.FloatField(
+                default=0, editable=False, verbose_name="Популярность"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="trending",
+            field=models.FloatField(
+                default=0,
+                editable=False,
+                verbose_name="Популярность за последние дни",
+            ),
+        ),
+        migrations.AddField(
+            model_name="shoppinglistrecipe",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=EPOCH,
+                verbose_name="Дата добавления",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-popularity", "-id"], name="food_recipe_popular_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-trending", "-id"], name="food_recipe_trending_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipelinkhits",
+            name="recipe",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="link_hits",
+                to="food.recipe",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="recipelinkhits",
+            constraint=models.UniqueConstraint(
+                fields=("recipe", "day"), name="unique_recipe_link_hits_day"
+            ),
+        ),
+    ]
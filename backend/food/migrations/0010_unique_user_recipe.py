@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    for name in ("FavoriteRecipe", "ShoppingListRecipe"):
+        model = apps.get_model("food", name)
+        first = (
+            model.objects.values("user", "recipe")
+            .annotate(first=Min("pk"))
+            .values("first")
+        )
+        model.objects.exclude(pk__in=first).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food", "0009_timeline"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="favoriterecipe",
+            constraint=models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_favorite_recipe"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="shoppinglistrecipe",
+            constraint=models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_shopping_list_recipe"
+            ),
+        ),
+    ]
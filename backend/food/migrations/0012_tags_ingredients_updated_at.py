@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food", "0011_archived_shopping_cart"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredients",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Дата изменения"
+            ),
+        ),
+        migrations.AddField(
+            model_name="tags",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Дата изменения"
+            ),
+        ),
+    ]
@@ -2,14 +2,21 @@ import random
 import string
 
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.utils import timezone
 
+from users.models import Follow
 from .constants import (
     INGREDIENTS_NAME_MAX_LENGTH, MAX_AMOUNT_INGREDIENT,
     MAX_COOKING_TIME, MEAS_UNIT_MAX_LENGTH, MIN_AMOUNT_INGREDIENT,
-    MIN_COOKING_TIME, RECIPE_NAME_MAX_LENGTH, SHORT_CODE_URLS_MAX_LENGTH,
-    TAGS_NAME_MAX_LENGTH, TAGS_SLUG_MAX_LENGTH
+    MIN_COOKING_TIME, RECIPE_NAME_MAX_LENGTH, SEARCH_CONFIG,
+    SHORT_CODE_URLS_MAX_LENGTH, TAGS_NAME_MAX_LENGTH, TAGS_SLUG_MAX_LENGTH
 )
 
 User = get_user_model()
@@ -26,6 +33,11 @@ class Tags(models.Model):
         unique=True,
         verbose_name="Слаг"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Дата изменения",
+    )
 
     def __str__(self):
         return self.name
@@ -44,6 +56,11 @@ class Ingredients(models.Model):
         max_length=MEAS_UNIT_MAX_LENGTH,
         verbose_name="Единица измерения",
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Дата изменения",
+    )
 
     def __str__(self):
         return self.name
@@ -59,6 +76,158 @@ class Ingredients(models.Model):
         ]
 
 
+USER_FLAGS = ("is_favorited", "is_in_shopping_cart", "author_is_subscribed")
+RECIPE_READ_FIELDS = (
+    "id", "tags", "author", "ingredients", "is_favorited",
+    "is_in_shopping_cart", "name", "image", "text", "cooking_time",
+)
+RECIPE_READ_COLUMNS = ("name", "image", "text", "cooking_time")
+AUTHOR_READ_COLUMNS = (
+    "author__email", "author__username", "author__first_name",
+    "author__last_name", "author__avatar",
+)
+
+
+def scalar(queryset, function, field, output_field):
+    """
+    function(field) по queryset скалярным подзапросом, который можно
+    передать в aggregate() другого запроса. Подзапрос не связан с внешним
+    запросом, поэтому база выполняет его один раз.
+    """
+    return models.Max(Subquery(queryset.order_by().annotate(
+        value=models.Func(field, function=function, output_field=output_field)
+    ).values("value")))
+
+
+def table_state(name, queryset, last="updated_at"):
+    return {
+        f"{name}_count": scalar(
+            queryset, "COUNT", "pk", models.IntegerField()
+        ),
+        f"{name}_last": scalar(
+            queryset, "MAX", last, queryset.model._meta.get_field(last)
+        ),
+    }
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user, flags=USER_FLAGS):
+        """Флаги избранного, корзины и подписки на автора одним запросом."""
+        if not user.is_authenticated:
+            return self
+        subqueries = {
+            "is_favorited": FavoriteRecipe.objects.filter(
+                recipe=OuterRef("pk"), user_id=user.pk
+            ),
+            "is_in_shopping_cart": ShoppingListRecipe.objects.filter(
+                recipe=OuterRef("pk"), user_id=user.pk
+            ),
+            "author_is_subscribed": Follow.objects.filter(
+                following=OuterRef("author"), user_id=user.pk
+            ),
+        }
+        return self.annotate(**{
+            flag: Exists(subqueries[flag]) for flag in flags
+        })
+
+    def list_state(self, user):
+        """
+        Дешёвый отпечаток списка одним запросом: число рецептов и последнее
+        изменение по отфильтрованному списку; число строк и последнее
+        изменение пользователей (профили авторов), тегов и ингредиентов;
+        для пользователя — число и последний id его записей избранного,
+        корзины и подписок. Пользователи, теги и ингредиенты учитываются
+        целиком, без привязки к рецептам списка: правка любого из них
+        меняет отпечаток всех списков.
+        """
+        parts = {
+            **table_state("users", User.objects.all()),
+            **table_state("tags", Tags.objects.all()),
+            **table_state("ingredients", Ingredients.objects.all()),
+        }
+        if user.is_authenticated:
+            for name, model in (
+                ("favorite", FavoriteRecipe),
+                ("cart", ShoppingListRecipe),
+                ("follow", Follow),
+            ):
+                parts.update(table_state(
+                    name, model.objects.filter(user_id=user.pk), "id"
+                ))
+        return self.order_by().aggregate(
+            count=models.Count("pk"),
+            modified=models.Max("updated_at"),
+            popularity=models.Sum("popularity"),
+            trending=models.Sum("trending"),
+            **parts,
+        )
+
+    def search(self, text):
+        """
+        Полнотекстовый поиск по названию, описанию и ингредиентам,
+        результаты упорядочены по релевантности. Вне PostgreSQL -
+        поиск подстроки через LIKE.
+        """
+        if connections[self.db].vendor != "postgresql":
+            return self.filter(
+                Q(name__icontains=text)
+                | Q(text__icontains=text)
+                | Exists(IngredientInRecipe.objects.filter(
+                    recipe=OuterRef("pk"), ingredient__name__icontains=text
+                ))
+            )
+        query = SearchQuery(
+            text, config=SEARCH_CONFIG, search_type="websearch"
+        )
+        return self.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+        ).order_by("-search_rank", "-pub_date")
+
+    def update_search_vector(self):
+        """Пересчёт search_vector, нужен после изменения ингредиентов."""
+        if connections[self.db].vendor != "postgresql":
+            return 0
+        ingredient_names = Subquery(
+            IngredientInRecipe.objects.filter(recipe=OuterRef("pk"))
+            .values("recipe")
+            .annotate(names=StringAgg("ingredient__name", " "))
+            .values("names"),
+            output_field=models.TextField(),
+        )
+        return self.update(search_vector=(
+            SearchVector("name", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("text", weight="B", config=SEARCH_CONFIG)
+            + SearchVector(ingredient_names, weight="C", config=SEARCH_CONFIG)
+        ))
+
+    def for_read(self, user, fields=None, extra_columns=()):
+        """
+        Queryset для чтения рецептов. Если переданы поля ответа,
+        загружаются только нужные колонки, связи и флаги, а также
+        extra_columns, нужные помимо ответа (например, для пагинации).
+        """
+        if fields is None:
+            fields = RECIPE_READ_FIELDS
+        flags = [flag for flag in USER_FLAGS if flag in fields]
+        if "author" in fields:
+            flags.append("author_is_subscribed")
+        queryset = self.with_user_flags(user, flags)
+        if "author" in fields:
+            queryset = queryset.select_related("author")
+        if "tags" in fields:
+            queryset = queryset.prefetch_related("tags")
+        if "ingredients" in fields:
+            queryset = queryset.prefetch_related("recipe_ingredients")
+        if set(RECIPE_READ_FIELDS) - set(fields):
+            columns = [
+                field for field in RECIPE_READ_COLUMNS if field in fields
+            ]
+            if "author" in fields:
+                columns.extend(AUTHOR_READ_COLUMNS)
+            queryset = queryset.only("pk", *columns, *extra_columns)
+        return queryset
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -97,6 +266,20 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name="Дата публикации",
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Дата изменения",
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    popularity = models.FloatField(
+        default=0, editable=False, verbose_name="Популярность"
+    )
+    trending = models.FloatField(
+        default=0, editable=False, verbose_name="Популярность за последние дни"
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
         if not self.short_code:
@@ -118,6 +301,17 @@ class Recipe(models.Model):
         ordering = ["-pub_date"]
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            GinIndex(
+                fields=["search_vector"], name="food_recipe_search_idx"
+            ),
+            models.Index(
+                fields=["-popularity", "-id"], name="food_recipe_popular_idx"
+            ),
+            models.Index(
+                fields=["-trending", "-id"], name="food_recipe_trending_idx"
+            ),
+        ]
 
 
 class IngredientInRecipe(models.Model):
@@ -154,6 +348,16 @@ class FavoriteRecipe(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name="favorited_by"
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Дата добавления"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_favorite_recipe"
+            )
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.recipe.name}"
@@ -168,6 +372,144 @@ class ShoppingListRecipe(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name="shopping_cart_by"
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Дата добавления"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_shopping_list_recipe"
+            )
+        ]
 
     def __str__(self):
         return f"{self.user.username} в корзине: {self.recipe.name}"
+
+
+class ArchivedShoppingListRecipe(models.Model):
+    """Рецепты из давно не менявшихся корзин, перенесённые из корзины."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_purchases"
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="+"
+    )
+    created_at = models.DateTimeField(verbose_name="Дата добавления")
+    archived_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Дата архивации"
+    )
+
+    class Meta:
+        verbose_name = "Рецепт из архивной корзины"
+        verbose_name_plural = "Архивные корзины"
+
+    def __str__(self):
+        return f"{self.user_id} в архиве корзины: {self.recipe_id}"
+
+
+class RecipeSimilarity(models.Model):
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="similarities"
+    )
+    similar = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="similar_to"
+    )
+    score = models.FloatField(verbose_name="Близость")
+
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.similar_id}: {self.score:.3f}"
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "similar"],
+                name="unique_recipe_similarity",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["recipe", "-score"], name="food_similarity_score_idx"
+            ),
+        ]
+
+
+class RecipeLinkHits(models.Model):
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="link_hits"
+    )
+    day = models.DateField(verbose_name="День")
+    hits = models.PositiveIntegerField(
+        default=0, verbose_name="Переходов по короткой ссылке"
+    )
+
+    @classmethod
+    def record(cls, recipe_id):
+        day = timezone.localdate()
+        counter = cls.objects.filter(recipe_id=recipe_id, day=day)
+        if counter.update(hits=F("hits") + 1):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(recipe_id=recipe_id, day=day, hits=1)
+        except IntegrityError:
+            counter.update(hits=F("hits") + 1)
+
+    def __str__(self):
+        return f"{self.recipe_id} {self.day}: {self.hits}"
+
+    class Meta:
+        verbose_name = "Переходы по короткой ссылке"
+        verbose_name_plural = "Переходы по коротким ссылкам"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "day"], name="unique_recipe_link_hits_day"
+            )
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписчика, записывается при публикации."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline"
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+
+    def __str__(self):
+        return f"{self.user_id}: {self.recipe_id}"
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи лент"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_timeline_entry"
+            )
+        ]
+
+
+class TimelineSource(models.Model):
+    """
+    Автор со слишком большим числом подписчиков: его рецепты не
+    раскладываются по лентам, а подмешиваются в ленту при чтении.
+    """
+
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="timeline_source",
+    )
+
+    def __str__(self):
+        return str(self.author_id)
+
+    class Meta:
+        verbose_name = "Автор, читаемый без раскладки"
+        verbose_name_plural = "Авторы, читаемые без раскладки"
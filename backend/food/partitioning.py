@@ -0,0 +1,163 @@
+from django.db import transaction
+from django.db.models import Index
+
+PARTITION_KEY = "user_id"
+RELATION_TABLES = (
+    "food_favoriterecipe",
+    "food_shoppinglistrecipe",
+    "users_follow",
+)
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+        [table],
+    )
+    return cursor.fetchone() is not None
+
+
+def constraint_sql(quote, table, name, info, partitioned):
+    """
+    Ограничения и индексы, которые нельзя скопировать через LIKE:
+    уникальность на секционированной таблице должна включать ключ
+    секционирования, поэтому первичный ключ становится (id, user_id),
+    а при обратном переносе снова (id).
+    """
+    columns = info["columns"]
+    column_list = ", ".join(map(quote, columns))
+    if info["primary_key"]:
+        columns = [column for column in columns if column != PARTITION_KEY]
+        if partitioned:
+            columns.append(PARTITION_KEY)
+        return (
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} "
+            f"PRIMARY KEY ({', '.join(map(quote, columns))})"
+        )
+    if info["foreign_key"]:
+        target, target_column = info["foreign_key"]
+        return (
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} "
+            f"FOREIGN KEY ({column_list}) REFERENCES {quote(target)} "
+            f"({quote(target_column)}) DEFERRABLE INITIALLY DEFERRED"
+        )
+    if info["unique"]:
+        if partitioned and PARTITION_KEY not in columns:
+            raise ValueError(
+                f"Уникальность {name} не включает {PARTITION_KEY}"
+            )
+        return (
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} "
+            f"UNIQUE ({column_list})"
+        )
+    if info["index"]:
+        orders = info.get("orders") or ["ASC"] * len(columns)
+        method = "btree" if info["type"] == Index.suffix else info["type"]
+        return (
+            f"CREATE INDEX {quote(name)} ON {quote(table)} "
+            f"USING {method} ("
+            + ", ".join(
+                f"{quote(column)} {order}"
+                for column, order in zip(columns, orders)
+            )
+            + ")"
+        )
+    return None
+
+
+def rebuild_table(cursor, connection, table, partitions):
+    """
+    Пересоздаёт таблицу: секционированной по хешу user_id на partitions
+    секций или обычной при partitions=None. Данные копируются одним
+    INSERT ... SELECT под эксклюзивной блокировкой, индексы и
+    ограничения создаются после загрузки под прежними именами.
+    """
+    quote = connection.ops.quote_name
+    new_table = f"{table}_rebuilt"
+    cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+    constraints = connection.introspection.get_constraints(cursor, table)
+    statements = [
+        constraint_sql(quote, table, name, info, bool(partitions))
+        for name, info in constraints.items()
+        if not info["check"]
+    ]
+    partition_by = (
+        f" PARTITION BY HASH ({quote(PARTITION_KEY)})" if partitions else ""
+    )
+    cursor.execute(
+        f"CREATE TABLE {quote(new_table)} (LIKE {quote(table)} "
+        f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partition_by}"
+    )
+    for remainder in range(partitions or 0):
+        cursor.execute(
+            f"CREATE TABLE {quote(f'{table}_p{remainder}')} "
+            f"PARTITION OF {quote(new_table)} FOR VALUES WITH "
+            f"(MODULUS {partitions}, REMAINDER {remainder})"
+        )
+    cursor.execute(
+        f"INSERT INTO {quote(new_table)} SELECT * FROM {quote(table)}"
+    )
+    moved = cursor.rowcount
+    # Значение по умолчанию ссылается на последовательность старой
+    # таблицы и не даст её удалить.
+    cursor.execute(
+        f"ALTER TABLE {quote(new_table)} ALTER COLUMN {quote('id')} "
+        f"DROP DEFAULT"
+    )
+    cursor.execute(f"DROP TABLE {quote(table)}")
+    cursor.execute(f"ALTER TABLE {quote(new_table)} RENAME TO {quote(table)}")
+    if partitions:
+        sequence = f"{table}_id_partitioned_seq"
+        cursor.execute(
+            f"CREATE SEQUENCE {quote(sequence)} "
+            f"OWNED BY {quote(table)}.{quote('id')}"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ALTER COLUMN {quote('id')} "
+            f"SET DEFAULT nextval('{quote(sequence)}'::regclass)"
+        )
+    else:
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ALTER COLUMN {quote('id')} "
+            f"ADD GENERATED BY DEFAULT AS IDENTITY"
+        )
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, 'id')", [quote(table)]
+        )
+        sequence = cursor.fetchone()[0]
+    cursor.execute(
+        f"SELECT setval(%s, COALESCE(MAX(id), 0) + 1, false) "
+        f"FROM {quote(table)}",
+        [sequence],
+    )
+    for statement in filter(None, statements):
+        cursor.execute(statement)
+    return moved
+
+
+def partition_table(connection, table, partitions):
+    """
+    Переносит таблицу в секционированную по хешу user_id. Возвращает
+    число перенесённых строк или None, если таблица уже секционирована.
+    """
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            if is_partitioned(cursor, table):
+                return None
+            return rebuild_table(cursor, connection, table, partitions)
+
+
+def unpartition_table(connection, table):
+    """
+    Возвращает секционированную таблицу к обычной с первичным ключом
+    (id) и identity-столбцом, как её создают миграции Django.
+    Возвращает число перенесённых строк или None, если таблица не
+    секционирована.
+    """
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            if not is_partitioned(cursor, table):
+                return None
+            return rebuild_table(cursor, connection, table, None)
@@ -0,0 +1,81 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .constants import (POPULARITY_WEIGHTS, TRENDING_HALF_LIFE_DAYS,
+                        TRENDING_WINDOW_DAYS)
+from .models import (FavoriteRecipe, Recipe, RecipeLinkHits,
+                     ShoppingListRecipe)
+
+
+def daily_activity(since):
+    """Строки (вид события, id рецепта, день, число событий)."""
+    for kind, model in (
+        ("favorite", FavoriteRecipe), ("cart", ShoppingListRecipe)
+    ):
+        queryset = model.objects.order_by()
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+        for row in queryset.values(
+            "recipe_id", day=TruncDate("created_at")
+        ).annotate(events=Count("pk")).values_list(
+            "recipe_id", "day", "events"
+        ):
+            yield (kind, *row)
+    hits = RecipeLinkHits.objects.order_by()
+    if since is not None:
+        hits = hits.filter(day__gte=since.date())
+    for row in hits.values("recipe_id", "day").annotate(
+        events=Sum("hits")
+    ).values_list("recipe_id", "day", "events"):
+        yield ("link_hit", *row)
+
+
+def compute_scores(now=None):
+    """
+    Популярность - взвешенная сумма избранного, корзин и переходов по
+    короткой ссылке за всё время. Тренд - та же сумма за последние
+    TRENDING_WINDOW_DAYS дней, где вклад события уменьшается вдвое
+    каждые TRENDING_HALF_LIFE_DAYS дней.
+    """
+    today = timezone.localdate(now)
+    popularity = defaultdict(float)
+    for kind, recipe_id, day, events in daily_activity(None):
+        popularity[recipe_id] += POPULARITY_WEIGHTS[kind] * events
+    trending = defaultdict(float)
+    since = (now or timezone.now()) - timedelta(days=TRENDING_WINDOW_DAYS)
+    for kind, recipe_id, day, events in daily_activity(since):
+        decay = 0.5 ** ((today - day).days / TRENDING_HALF_LIFE_DAYS)
+        trending[recipe_id] += POPULARITY_WEIGHTS[kind] * events * decay
+    return popularity, trending
+
+
+def update_rankings(batch_size, now=None):
+    """Записывает в Recipe только изменившиеся оценки."""
+    popularity, trending = compute_scores(now)
+    current = {
+        recipe_id: (recipe_popularity, recipe_trending)
+        for recipe_id, recipe_popularity, recipe_trending in (
+            Recipe.objects.exclude(popularity=0, trending=0)
+            .values_list("pk", "popularity", "trending")
+        )
+    }
+    scores = dict.fromkeys(current, (0.0, 0.0))
+    scores.update({
+        recipe_id: (
+            round(popularity[recipe_id], 4), round(trending[recipe_id], 4)
+        )
+        for recipe_id in popularity.keys() | trending.keys()
+    })
+    changed = [
+        Recipe(pk=recipe_id, popularity=score[0], trending=score[1])
+        for recipe_id, score in scores.items()
+        if current.get(recipe_id, (0.0, 0.0)) != score
+    ]
+    Recipe.objects.bulk_update(
+        changed, ["popularity", "trending"], batch_size=batch_size
+    )
+    return len(changed)
@@ -0,0 +1,108 @@
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from .models import FavoriteRecipe, RecipeSimilarity, ShoppingListRecipe
+
+
+def interactions(model):
+    return np.fromiter(
+        chain.from_iterable(
+            model.objects.order_by()
+            .values_list("user_id", "recipe_id")
+            .iterator(chunk_size=20000)
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+
+def top_neighbors(columns, values, recipe, norms, top_k):
+    """Соседи строки матрицы совстречаемости по косинусной мере."""
+    mask = columns != recipe
+    columns = columns[mask]
+    scores = values[mask] / (norms[recipe] * norms[columns])
+    if len(scores) > top_k:
+        top = np.argpartition(-scores, top_k)[:top_k]
+        columns, scores = columns[top], scores[top]
+    return columns, scores
+
+
+def build_similarities(top_k, cart_weight, block_size, batch_size):
+    """
+    Строит матрицу пользователи x рецепты из избранного (вес 1) и корзин
+    (вес cart_weight), считает совстречаемость X^T X блоками строк и
+    сохраняет top_k соседей каждого рецепта в RecipeSimilarity.
+    Таблица заменяется целиком в одной транзакции. scipy нужен только
+    здесь, поэтому не импортируется в процессах API.
+    """
+    from scipy.sparse import csr_matrix
+
+    favorites = interactions(FavoriteRecipe)
+    carts = interactions(ShoppingListRecipe)
+    pairs = np.concatenate((favorites, carts))
+    weights = np.concatenate((
+        np.ones(len(favorites)), np.full(len(carts), cart_weight)
+    ))
+    created = 0
+    with transaction.atomic():
+        RecipeSimilarity.objects.all().delete()
+        if not len(pairs):
+            return created
+        _, users = np.unique(pairs[:, 0], return_inverse=True)
+        recipe_ids, recipes = np.unique(pairs[:, 1], return_inverse=True)
+        matrix = csr_matrix(
+            (weights, (users, recipes)),
+            shape=(users.max() + 1, len(recipe_ids)),
+        )
+        transposed = matrix.T.tocsr()
+        norms = np.sqrt(
+            np.asarray(transposed.multiply(transposed).sum(axis=1)).ravel()
+        )
+        for start in range(0, len(recipe_ids), block_size):
+            block = (transposed[start:start + block_size] @ matrix).tocsr()
+            similarities = []
+            for offset in range(block.shape[0]):
+                recipe = start + offset
+                row = slice(block.indptr[offset], block.indptr[offset + 1])
+                columns, scores = top_neighbors(
+                    block.indices[row], block.data[row], recipe, norms, top_k
+                )
+                similarities.extend(
+                    RecipeSimilarity(
+                        recipe_id=int(recipe_ids[recipe]),
+                        similar_id=int(recipe_ids[column]),
+                        score=float(score),
+                    )
+                    for column, score in zip(columns, scores)
+                )
+            RecipeSimilarity.objects.bulk_create(
+                similarities, batch_size=batch_size
+            )
+            created += len(similarities)
+    return created
+
+
+def recommended_recipe_ids(user, limit):
+    """
+    Рецепты, похожие на избранное и корзину пользователя, кроме уже
+    добавленных туда, по сумме близости.
+    """
+    favorites = FavoriteRecipe.objects.filter(
+        user_id=user.pk
+    ).values("recipe_id")
+    carts = ShoppingListRecipe.objects.filter(
+        user_id=user.pk
+    ).values("recipe_id")
+    return list(
+        RecipeSimilarity.objects.filter(
+            Q(recipe_id__in=favorites) | Q(recipe_id__in=carts)
+        )
+        .exclude(similar_id__in=favorites)
+        .exclude(similar_id__in=carts)
+        .values("similar_id")
+        .annotate(total=Sum("score"))
+        .order_by("-total", "-similar_id")
+        .values_list("similar_id", flat=True)[:limit]
+    )
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from api.utils import discard_shopping_cart_pdfs
+from .ingredient_catalog import ingredient_catalog
+from .ingredient_index import ingredient_index
+from .models import Ingredients, Recipe, ShoppingListRecipe
+
+
+def discard_cart_pdfs_with(recipes):
+    """Удаляет готовые PDF корзин, в которых есть эти рецепты."""
+    user_ids = list(
+        ShoppingListRecipe.objects.filter(recipe__in=recipes)
+        .values_list("user_id", flat=True).distinct()
+    )
+    if user_ids:
+        transaction.on_commit(lambda: discard_shopping_cart_pdfs(user_ids))
+
+
+@receiver(post_save, sender=Ingredients)
+def update_recipes_search_vector(sender, instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(
+            recipe_ingredients__ingredient=instance
+        ).update_search_vector()
+
+
+@receiver(post_save, sender=Ingredients)
+def discard_shopping_cart_pdfs_with_ingredient(
+    sender, instance, created, **kwargs
+):
+    if not created:
+        discard_cart_pdfs_with(
+            Recipe.objects.filter(recipe_ingredients__ingredient=instance)
+        )
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def invalidate_ingredient_catalog(sender, **kwargs):
+    transaction.on_commit(ingredient_catalog.invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+def discard_recipe_from_index(sender, instance, **kwargs):
+    ingredient_index.discard(instance.pk)
+
+
+@receiver(pre_delete, sender=Recipe)
+def discard_shopping_cart_pdfs_with_recipe(sender, instance, **kwargs):
+    discard_cart_pdfs_with([instance.pk])
@@ -0,0 +1,10 @@
+from background.jobs import task
+from .models import Recipe
+from .timeline import fan_out
+
+
+@task("timeline_fan_out")
+def timeline_fan_out(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).only("pk", "author").first()
+    if recipe is not None:
+        fan_out(recipe)
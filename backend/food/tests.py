@@ -0,0 +1,124 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TransactionTestCase
+
+from users.models import Follow
+from .models import FavoriteRecipe, Recipe, ShoppingListRecipe
+from .partitioning import (RELATION_TABLES, is_partitioned,
+                           unpartition_table)
+
+User = get_user_model()
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Секционирование доступно только в PostgreSQL",
+)
+class PartitionRelationsTests(TransactionTestCase):
+    """
+    Перенос меняет таблицы через DDL, а в одной транзакции с только что
+    вставленными строками PostgreSQL не даёт менять таблицы с
+    отложенными проверками внешних ключей, поэтому TransactionTestCase.
+    """
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f"user{number}@example.com",
+                username=f"user{number}",
+                first_name="Имя",
+                last_name="Фамилия",
+                password="password",
+            )
+            for number in range(3)
+        ]
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.users[0],
+                name=f"Рецепт {number}",
+                image="recipes/images/test.png",
+                text="Описание",
+                cooking_time=5,
+            )
+            for number in range(3)
+        ]
+        for user in self.users:
+            for recipe in self.recipes[:2]:
+                FavoriteRecipe.objects.create(user=user, recipe=recipe)
+                ShoppingListRecipe.objects.create(user=user, recipe=recipe)
+        Follow.objects.create(user=self.users[1], following=self.users[0])
+        Follow.objects.create(user=self.users[2], following=self.users[0])
+        self.addCleanup(self.unpartition)
+
+    def unpartition(self):
+        for table in RELATION_TABLES:
+            unpartition_table(connection, table)
+
+    def constraints(self):
+        with connection.cursor() as cursor:
+            return {
+                table: {
+                    name: (info["columns"], info["primary_key"])
+                    for name, info in connection.introspection
+                    .get_constraints(cursor, table).items()
+                }
+                for table in RELATION_TABLES
+            }
+
+    def partitioned(self):
+        with connection.cursor() as cursor:
+            return {
+                table: is_partitioned(cursor, table)
+                for table in RELATION_TABLES
+            }
+
+    def rows(self):
+        return (
+            sorted(FavoriteRecipe.objects.values_list("pk", "user", "recipe")),
+            sorted(
+                ShoppingListRecipe.objects.values_list("pk", "user", "recipe")
+            ),
+            sorted(Follow.objects.values_list("pk", "user", "following")),
+        )
+
+    def assert_writable(self, user):
+        recipe = self.recipes[2]
+        latest = FavoriteRecipe.objects.latest("pk").pk
+        self.assertGreater(
+            FavoriteRecipe.objects.create(user=user, recipe=recipe).pk, latest
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FavoriteRecipe.objects.create(user=user, recipe=recipe)
+
+    def test_partition_and_reverse(self):
+        constraints = self.constraints()
+        rows = self.rows()
+
+        call_command("partition_relations", partitions=4, stdout=StringIO())
+        self.assertTrue(all(self.partitioned().values()))
+        self.assertEqual(self.rows(), rows)
+        self.assertEqual(
+            self.constraints()["food_favoriterecipe"].keys(),
+            constraints["food_favoriterecipe"].keys(),
+        )
+        self.assert_writable(self.users[1])
+        rows = self.rows()
+
+        call_command("partition_relations", reverse=True, stdout=StringIO())
+        self.assertFalse(any(self.partitioned().values()))
+        self.assertEqual(self.rows(), rows)
+        self.assertEqual(self.constraints(), constraints)
+        self.assert_writable(self.users[2])
+
+    def test_repeated_runs_are_noop(self):
+        output = StringIO()
+        call_command("partition_relations", reverse=True, stdout=output)
+        self.assertIn("не секционирована", output.getvalue())
+        call_command("partition_relations", partitions=4, stdout=StringIO())
+        output = StringIO()
+        call_command("partition_relations", partitions=4, stdout=output)
+        self.assertIn("уже секционирована", output.getvalue())
@@ -0,0 +1,129 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from background.jobs import enqueue
+from users.models import Follow
+from .constants import (TIMELINE_FANOUT_LIMIT, TIMELINE_SIZE,
+                        TIMELINE_TRIM_BATCH_SIZE)
+from .models import Recipe, TimelineEntry, TimelineSource
+
+
+def enqueue_fan_out(recipe):
+    """Раскладывает рецепт по лентам в фоне после коммита транзакции."""
+    transaction.on_commit(lambda: enqueue(
+        "timeline_fan_out", idempotency_key=f"fan_out:{recipe.pk}",
+        recipe_id=recipe.pk,
+    ))
+
+
+def fan_out(recipe):
+    """
+    Раскладывает новый рецепт по лентам подписчиков автора и обрезает
+    их до TIMELINE_SIZE. Авторы, у которых подписчиков больше
+    TIMELINE_FANOUT_LIMIT, помечаются TimelineSource и читаются при
+    запросе ленты.
+    """
+    followers = list(
+        Follow.objects.filter(following_id=recipe.author_id)
+        .values_list("user_id", flat=True)[:TIMELINE_FANOUT_LIMIT + 1]
+    )
+    if len(followers) > TIMELINE_FANOUT_LIMIT:
+        TimelineSource.objects.get_or_create(author_id=recipe.author_id)
+        return 0
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, recipe_id=recipe.pk)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+    trim(TIMELINE_TRIM_BATCH_SIZE, followers)
+    return len(followers)
+
+
+def follow(user_id, author_id):
+    """Добавляет в ленту последние рецепты нового автора."""
+    if TimelineSource.objects.filter(author_id=author_id).exists():
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in Recipe.objects.filter(author_id=author_id)
+            .order_by("-id")
+            .values_list("id", flat=True)[:TIMELINE_SIZE]
+        ],
+        ignore_conflicts=True,
+    )
+    trim(TIMELINE_TRIM_BATCH_SIZE, [user_id])
+
+
+def unfollow(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def feed_filter(user_id):
+    """Рецепты из ленты пользователя и от читаемых при запросе авторов."""
+    return Q(pk__in=TimelineEntry.objects.filter(
+        user_id=user_id
+    ).values("recipe_id")) | Q(author_id__in=TimelineSource.objects.filter(
+        author__followers__user_id=user_id
+    ).values("author_id"))
+
+
+def trim(batch_size, user_ids=None):
+    """
+    Оставляет TIMELINE_SIZE последних рецептов в каждой ленте или только
+    в лентах user_ids. Оконная функция считается только по лентам,
+    которые длиннее TIMELINE_SIZE.
+    """
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=TimelineEntry.objects.filter(
+            user_id__in=user_ids
+        ).values("user_id").annotate(
+            total=Count("pk")
+        ).filter(total__gt=TIMELINE_SIZE).values("user_id"))
+    overflow = list(entries.annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F("user_id"),
+            order_by=F("recipe_id").desc(),
+        )
+    ).filter(position__gt=TIMELINE_SIZE).values_list("pk", flat=True))
+    for start in range(0, len(overflow), batch_size):
+        TimelineEntry.objects.filter(
+            pk__in=overflow[start:start + batch_size]
+        ).delete()
+    return len(overflow)
+
+
+@transaction.atomic
+def rebuild(batch_size):
+    """Пересобирает ленты и список авторов, читаемых при запросе."""
+    TimelineSource.objects.all().delete()
+    TimelineSource.objects.bulk_create(
+        TimelineSource(author_id=author_id)
+        for author_id in Follow.objects.values("following_id")
+        .annotate(followers=Count("pk"))
+        .filter(followers__gt=TIMELINE_FANOUT_LIMIT)
+        .values_list("following_id", flat=True)
+    )
+    TimelineEntry.objects.all().delete()
+    users = Follow.objects.order_by("user_id").values_list(
+        "user_id", flat=True
+    ).distinct()
+    created = 0
+    for user_id in users.iterator(chunk_size=batch_size):
+        entries = [
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in Recipe.objects.filter(
+                author__followers__user_id=user_id,
+                author__timeline_source=None,
+            ).order_by("-id").values_list("id", flat=True)[:TIMELINE_SIZE]
+        ]
+        TimelineEntry.objects.bulk_create(entries, batch_size=batch_size)
+        created += len(entries)
+    return created
@@ -0,0 +1,140 @@
+import os
+import time
+from contextlib import contextmanager
+from glob import glob
+from ipaddress import ip_address, ip_network
+
+from django.conf import settings
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+SIZE_BUCKETS = (
+    1024, 10 * 1024, 100 * 1024, 512 * 1024,
+    1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2,
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REQUEST_DURATION = Histogram(
+    "foodgram_request_duration_seconds",
+    "Время обработки запроса.",
+    ("view", "method"),
+)
+REQUESTS = Counter(
+    "foodgram_requests",
+    "Число обработанных запросов.",
+    ("view", "method", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "foodgram_request_db_queries",
+    "Число запросов к БД за один запрос.",
+    ("view",),
+    buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "foodgram_request_db_duration_seconds",
+    "Время запросов к БД за один запрос.",
+    ("view",),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "foodgram_requests_in_progress",
+    "Запросы, обрабатываемые в данный момент.",
+    multiprocess_mode="livesum",
+)
+WORKERS = Gauge(
+    "foodgram_workers",
+    "Число живых процессов-обработчиков.",
+    multiprocess_mode="livesum",
+)
+WORKER_STARTUP_DURATION = Histogram(
+    "foodgram_worker_startup_seconds",
+    "Время от fork процесса-обработчика до готовности принимать запросы.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+CACHE_REQUESTS = Counter(
+    "foodgram_cache_requests",
+    "Обращения к кешу.",
+    ("cache", "result"),
+)
+CACHE_REBUILDS = Counter(
+    "foodgram_cache_rebuilds",
+    "Перестроения кешей в памяти процесса.",
+    ("cache",),
+)
+PDF_DURATION = Histogram(
+    "foodgram_pdf_generation_seconds",
+    "Время генерации PDF со списком покупок.",
+)
+PDF_SIZE = Histogram(
+    "foodgram_pdf_size_bytes",
+    "Размер PDF со списком покупок.",
+    buckets=SIZE_BUCKETS,
+)
+IMAGE_DECODE_DURATION = Histogram(
+    "foodgram_image_decode_seconds",
+    "Время декодирования загруженного изображения.",
+)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+@contextmanager
+def timer(histogram):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+class MultiprocessDirsCollector:
+    """
+    MultiProcessCollector по нескольким каталогам: у gunicorn и воркера
+    фоновых задач свои каталоги, чтобы не совпадали PID из разных
+    контейнеров и gunicorn при запуске не стирал файлы воркера.
+    """
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def collect(self):
+        files = [
+            file
+            for path in self.paths
+            for file in glob(os.path.join(path, "*.db"))
+        ]
+        return multiprocess.MultiProcessCollector.merge(
+            files, accumulate=True
+        )
+
+
+def is_allowed(request):
+    """Администратор или запрос напрямую из внутренней сети."""
+    if request.user.is_staff:
+        return True
+    if "HTTP_X_FORWARDED_FOR" in request.META:
+        return False
+    try:
+        address = ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ip_network(network)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
+
+
+def export():
+    """Метрики в текстовом формате Prometheus, собранные со всех воркеров."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        registry.register(MultiprocessDirsCollector(
+            settings.PROMETHEUS_COLLECT_DIRS
+            or [os.environ["PROMETHEUS_MULTIPROC_DIR"]]
+        ))
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -31,10 +31,15 @@ INSTALLED_APPS = [
     "api.apps.ApiConfig",
     "users.apps.UsersConfig",
     "food.apps.FoodConfig",
+    "background.apps.BackgroundConfig",
 ]
 
 MIDDLEWARE = [
+    "api.middleware.InstrumentationMiddleware",
+    "api.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.CompressionMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -82,6 +87,71 @@ else:
         }
     }
 
+# Реплики для чтения: в DEBUG файлы SQLite, иначе host[:port][/db].
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv("DB_REPLICAS", "").split(",")), 1
+):
+    alias = f"replica{number}"
+    if DEBUG:
+        options = {"NAME": BASE_DIR / replica}
+    else:
+        address, _, name = replica.partition("/")
+        host, _, port = address.partition(":")
+        options = {
+            "HOST": host,
+            "PORT": port or DATABASES["default"]["PORT"],
+            "NAME": name or DATABASES["default"]["NAME"],
+        }
+    DATABASES[alias] = {
+        **DATABASES["default"], **options, "TEST": {"MIRROR": "default"}
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["api.replicas.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 10))
+REPLICA_PIN_CACHE = "replica_pins"
+THROTTLE_CACHE = "throttle"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Отметки должны быть общими для всех процессов gunicorn.
+    REPLICA_PIN_CACHE: {
+        "BACKEND": os.getenv(
+            "REPLICA_PIN_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "REPLICA_PIN_CACHE_LOCATION", "/tmp/foodgram-replica-pins"
+        ),
+    },
+    # Счётчики ограничений частоты запросов общие для процессов gunicorn
+    # и переживают их перезапуск.
+    THROTTLE_CACHE: {
+        "BACKEND": os.getenv(
+            "THROTTLE_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "THROTTLE_CACHE_LOCATION", "/tmp/foodgram-throttle"
+        ),
+    },
+}
+
+
+PASSWORD_HASHERS = [
+    "users.hashers.TunedArgon2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 2))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 65536))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 1))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -117,18 +187,36 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.SafeMethodLazyJWTAuthentication",
     ],
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.OrderingFilter",
     ),
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    # За nginx: IP клиента — последний адрес в X-Forwarded-For, то, что
+    # клиент прислал в заголовке сам, не учитывается.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 1)),
+    "DEFAULT_THROTTLE_RATES": {
+        "login": os.getenv("LOGIN_THROTTLE_RATE", "20/min"),
+        "login_email": os.getenv("LOGIN_EMAIL_THROTTLE_RATE", "5/min"),
+        "export": os.getenv("EXPORT_THROTTLE_RATE", "30/hour"),
+    },
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Token",),
     "TOKEN_OBTAIN_SERIALIZER": "api.serializers.NewTokenObtainPairSerializer",
+    "TOKEN_USER_CLASS": "api.authentication.LazyTokenUser",
 }
 
 AUTH_USER_MODEL = "users.User"
@@ -152,8 +240,62 @@ AUTHENTICATION_BACKENDS = [
     "api.backends.EmailBackend",
 ]
 
+INSTRUMENTATION_ENABLED = (
+    os.getenv("INSTRUMENTATION_ENABLED", "False") == "True"
+)
+INSTRUMENTATION_DUPLICATE_QUERIES = int(
+    os.getenv("INSTRUMENTATION_DUPLICATE_QUERIES", 10)
+)
+INSTRUMENTATION_SAMPLE_SIZE = int(
+    os.getenv("INSTRUMENTATION_SAMPLE_SIZE", 1000)
+)
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+
+PROMETHEUS_ENABLED = os.getenv("PROMETHEUS_ENABLED", "False") == "True"
+PROMETHEUS_COLLECT_DIRS = [
+    path for path in os.getenv("PROMETHEUS_COLLECT_DIRS", "").split(",")
+    if path
+]
+METRICS_ALLOWED_NETWORKS = os.getenv(
+    "METRICS_ALLOWED_NETWORKS",
+    "127.0.0.0/8,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,::1/128",
+).split(",")
+
+TASKS_EAGER = os.getenv("TASKS_EAGER", "False") == "True"
+TASKS_LOCK_TIMEOUT = int(os.getenv("TASKS_LOCK_TIMEOUT", 600))
+TASKS_RETRY_DELAY = int(os.getenv("TASKS_RETRY_DELAY", 30))
+TASKS_RETENTION_DAYS = int(os.getenv("TASKS_RETENTION_DAYS", 7))
+TASKS_PRUNE_INTERVAL = int(os.getenv("TASKS_PRUNE_INTERVAL", 3600))
+SHOPPING_CART_RETRY_AFTER = int(os.getenv("SHOPPING_CART_RETRY_AFTER", 5))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api": {"handlers": ["console"], "level": "INFO"},
+        "background": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Размеры уменьшенных копий картинок для параметра ?image_size=.
+THUMBNAIL_SIZES = {
+    "small": (160, 160),
+    "medium": (480, 360),
+    "large": (960, 720),
+}
+
+IMAGE_MAX_SIZE = int(os.getenv("IMAGE_MAX_SIZE", 5 * 1024 * 1024))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", 25_000_000))
+# Картинка приходит в JSON в base64, тело запроса больше файла на треть.
+DATA_UPLOAD_MAX_MEMORY_SIZE = IMAGE_MAX_SIZE * 4 // 3 + 1024 * 1024
+
 PAGE_SIZE = 10
 MAX_PAGE_SIZE = 100
@@ -1,4 +1,4 @@
-from api.views import redirect_to_recipe
+from api.views import export_metrics, redirect_to_recipe, thumbnail
 from django.contrib import admin
 from django.urls import include, path
 
@@ -10,4 +10,10 @@ urlpatterns = [
         redirect_to_recipe,
         name="redirect_to_recipe",
     ),
+    path("metrics/", export_metrics, name="prometheus_metrics"),
+    path(
+        "media/thumb/<int:width>x<int:height>/<str:signature>/<path:path>",
+        thumbnail,
+        name="thumbnail",
+    ),
 ]
@@ -0,0 +1,51 @@
+import os
+import shutil
+import time
+
+from prometheus_client import multiprocess
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/foodgram-metrics")
+# С preload_app метрики создаются в мастере ещё до on_starting.
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+STARTED_AT = time.monotonic()
+
+# Приложение импортируется один раз в мастере, процессы-обработчики
+# получают его через fork и готовы почти сразу, а страницы памяти
+# с модулями общие, пока их не изменят.
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+
+def on_starting(server):
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def when_ready(server):
+    server.log.info(
+        "Мастер готов за %.3f с (preload_app=%s)",
+        time.monotonic() - STARTED_AT,
+        server.cfg.preload_app,
+    )
+
+
+def pre_fork(server, worker):
+    worker.spawned_at = time.monotonic()
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    from foodgram import metrics
+
+    ready = time.monotonic() - worker.spawned_at
+    metrics.WORKERS.set(1)
+    metrics.WORKER_STARTUP_DURATION.observe(ready)
+    worker.log.info("Обработчик %s готов за %.3f с", worker.pid, ready)
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:02
+
+import users.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_user_users_user_email_lower_idx"),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name="user",
+            managers=[
+                ("objects", users.models.CustomUserManager()),
+            ],
+        ),
+    ]
@@ -1,10 +1,47 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Lower
 
 from .constants import (MAX_EMAIL_LENGTH, MAX_FIRST_NAME_LENGTH,
                         MAX_LAST_NAME_LENGTH, USERNAME_MAX_LENGTH)
 from .validators import validate_username
 
+USER_READ_FIELDS = (
+    "email", "id", "username", "first_name", "last_name",
+    "is_subscribed", "avatar",
+)
+USER_READ_COLUMNS = (
+    "email", "username", "first_name", "last_name", "avatar",
+)
+
+
+class UserQuerySet(models.QuerySet):
+    def with_is_subscribed(self, user):
+        """Флаг подписки текущего пользователя одним запросом."""
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_subscribed=Exists(Follow.objects.filter(
+                user_id=user.pk, following=OuterRef("pk")
+            ))
+        )
+
+    def for_read(self, user, fields=None):
+        """Только нужные для ответа колонки и флаг подписки."""
+        if fields is None:
+            return self.with_is_subscribed(user)
+        queryset = self
+        if "is_subscribed" in fields:
+            queryset = queryset.with_is_subscribed(user)
+        return queryset.only("pk", *(
+            column for column in USER_READ_COLUMNS if column in fields
+        ))
+
+
+class CustomUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
 
 class User(AbstractUser):
     USERNAME_FIELD = "email"
@@ -31,6 +68,18 @@ class User(AbstractUser):
         },
     )
     avatar = models.ImageField(upload_to="users/", blank=True, null=True)
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Дата изменения",
+    )
+
+    objects = CustomUserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(Lower("email"), name="users_user_email_lower_idx"),
+        ]
 
 
 class Follow(models.Model):